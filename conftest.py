@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache(django_test_environment):
+    """Тесты не трогают общий кэш сайта (см. core.test_runner).
+
+    Миниатюры строятся сразу после коммита: фоновое построение переживало
+    бы тест и писало во временный MEDIA_ROOT после его удаления.
+    """
+    from core.test_runner import isolated_cache
+    with isolated_cache(THUMBNAIL_WORKERS=0):
+        yield
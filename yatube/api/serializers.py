@@ -0,0 +1,69 @@
+"""Явные словари вместо обхода полей модели.
+
+Каждая функция читает ровно те поля, что попадают в ответ, и ровно
+их же перечисляют querysets из `FIELDS`, ограниченные через `only()`.
+"""
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'comments_count',
+    'author__id', 'author__username', 'author__first_name',
+    'author__last_name', 'group__id', 'group__slug', 'group__title',
+)
+COMMENT_FIELDS = (
+    'id', 'text', 'created', 'post_id',
+    'author__id', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+
+
+def user(user):
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'name': f'{user.first_name} {user.last_name}'.strip(),
+    }
+
+
+def group(group):
+    if group is None:
+        return None
+    return {
+        'id': group.pk,
+        'slug': group.slug,
+        'title': group.title,
+    }
+
+
+def post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': user(post.author),
+        'group': group(post.group),
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def comment(comment):
+    return {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': user(comment.author),
+    }
+
+
+def page(page, item, path):
+    """Страница курсорной выдачи со ссылками на соседние страницы."""
+    return {
+        'results': [item(obj) for obj in page],
+        'next': (
+            f'{path}?cursor={page.next_cursor}'
+            if page.next_cursor else None),
+        'previous': (
+            f'{path}?cursor={page.previous_cursor}'
+            if page.previous_cursor else None),
+    }
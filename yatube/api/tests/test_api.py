@@ -0,0 +1,182 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+@override_settings(OBJ_ON_PAGES=5, COMMENTS_ON_PAGE=5)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(7)]
+        cls.post = cls.posts[-1]
+        for number in range(6):
+            cls.post.comments.create(
+                author=cls.reader, text=f'Комментарий {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def collect(self, url, client=None):
+        client = client or self.client
+        results = []
+        while url:
+            data = client.get(url).json()
+            results.extend(data['results'])
+            url = data['next']
+        return results
+
+    def test_post_fields(self):
+        """Пост отдаётся со всеми полями, автором и группой"""
+        response = self.client.get(
+            reverse('api:post_detail', args=(self.post.pk,)))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), {
+            'id': self.post.pk,
+            'text': 'Пост 6',
+            'pub_date': self.post.pub_date.isoformat(),
+            'author': {
+                'id': self.author.pk, 'username': 'author',
+                'name': 'Лев Толстой'},
+            'group': {'id': self.group.pk, 'slug': 'group',
+                      'title': 'Группа'},
+            'image': None,
+            'comments_count': 6,
+        })
+
+    def test_listings_paginated_by_cursor(self):
+        """Списки постов листаются курсором до конца"""
+        expected = [post.pk for post in reversed(self.posts)]
+        for url in (reverse('api:index'),
+                    reverse('api:group_posts', args=('group',)),
+                    reverse('api:profile_posts', args=('author',))):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    [post['id'] for post in self.collect(url)], expected)
+        self.assertEqual(
+            len(self.collect(
+                reverse('api:post_comments', args=(self.post.pk,)))), 6)
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только после входа"""
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(
+            [post['id'] for post in self.collect(url, self.reader_client)],
+            [post.pk for post in reversed(self.posts)])
+        etag = self.reader_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified(self):
+        """Повторный запрос с прежним ETag получает 304"""
+        for url in (reverse('api:index'),
+                    reverse('api:post_detail', args=(self.post.pk,))):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_found(self):
+        """Несуществующие объекты дают 404 в JSON"""
+        for url in (reverse('api:post_detail', args=(0,)),
+                    reverse('api:post_comments', args=(0,)),
+                    reverse('api:group_posts', args=('missing',)),
+                    reverse('api:profile_posts', args=('missing',))):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+    def test_one_query_with_only_needed_columns(self):
+        """Страница постов — один запрос без лишних колонок"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api:index'))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"posts_group"."slug"', sql)
+        for column in ('image_hash', 'password', 'description'):
+            self.assertNotIn(column, sql)
+
+    def test_read_only(self):
+        """API не принимает изменений"""
+        response = self.reader_client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
+
+
+class PostsBatchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(4)]
+        cls.url = reverse('api:posts_batch')
+
+    def setUp(self):
+        cache.clear()
+
+    def batch(self, ids):
+        return self.client.get(
+            self.url, {'ids': ','.join(map(str, ids))})
+
+    def test_requested_order(self):
+        """Посты приходят в запрошенном порядке, лишние id перечислены"""
+        first, second, third, _ = self.posts
+        data = self.batch(
+            [third.pk, 10 ** 6, first.pk, third.pk, second.pk]).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [third.pk, first.pk, second.pk])
+        self.assertEqual(data['not_found'], [10 ** 6])
+        self.assertEqual(data['results'][0]['group']['slug'], 'group')
+
+    def test_cache_first(self):
+        """Повторный запрос не ходит в базу, правка перечитывает один пост"""
+        ids = [post.pk for post in self.posts]
+        with CaptureQueriesContext(connection) as queries:
+            self.batch(ids)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(' IN (', queries[0]['sql'])
+        with self.assertNumQueries(0):
+            self.batch(ids)
+
+        edited = self.posts[1]
+        Post.objects.filter(pk=edited.pk).update(text='Исправлено')
+        Post.objects.get(pk=edited.pk).save()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.batch(ids).json()
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'IN ({edited.pk})', queries[0]['sql'])
+        self.assertEqual(data['results'][1]['text'], 'Исправлено')
+
+    def test_bad_requests(self):
+        """Слишком много или нечисловые id отклоняются"""
+        with override_settings(API_BATCH_LIMIT=3):
+            self.assertEqual(self.batch(range(1, 5)).status_code, 400)
+        for ids in ('1,a', '-1', '1,,2x', str(2 ** 64)):
+            with self.subTest(ids=ids):
+                response = self.client.get(self.url, {'ids': ids})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url).json(),
+            {'results': [], 'not_found': []})
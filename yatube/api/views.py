@@ -0,0 +1,177 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views.decorators.http import require_safe
+
+from posts import caching, feed
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator, FeedPaginator
+from posts.views import post_detail_scopes
+
+from . import serializers
+
+BATCH_POST_KEY = 'api-post:{}:{}:{}'
+
+
+def respond(data, status=200):
+    return JsonResponse(
+        data, status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def not_found():
+    return respond({'detail': 'Не найдено.'}, status=404)
+
+
+def bad_request(detail):
+    return respond({'detail': detail}, status=400)
+
+
+def posts():
+    return Post.objects.select_related('author', 'group').only(
+        *serializers.POST_FIELDS)
+
+
+def post_page(request, queryset):
+    paginator = CursorPaginator(queryset, settings.OBJ_ON_PAGES)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return respond(serializers.page(page, serializers.post, request.path))
+
+
+@require_safe
+@caching.cache_shared_page(lambda: (caching.INDEX,))
+def index(request):
+    return post_page(request, posts())
+
+
+@require_safe
+@caching.cache_shared_page(lambda slug: (caching.group_scope(slug),))
+def group_posts(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    if group_id is None:
+        return not_found()
+    return post_page(request, posts().filter(group=group_id))
+
+
+@require_safe
+@caching.cache_shared_page(
+    lambda username: (caching.profile_scope(username),))
+def profile_posts(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return not_found()
+    return post_page(request, posts().filter(author=author_id))
+
+
+@require_safe
+@caching.cache_shared_page(post_detail_scopes)
+def post_detail(request, post_id):
+    post = posts().filter(pk=post_id).first()
+    if post is None:
+        return not_found()
+    return respond(serializers.post(post))
+
+
+def parse_ids(raw):
+    """Список id из строки «1,2,3» без повторов, в исходном порядке."""
+    ids = [int(value) for value in raw.split(',') if value.strip()]
+    if any(not 0 < pk < 2 ** 63 for pk in ids):
+        raise ValueError(raw)
+    return list(dict.fromkeys(ids))
+
+
+def cached_posts(ids):
+    """Посты в JSON-виде: из кэша по постам, промахи одним запросом.
+
+    Ключ поста включает версии его области и групп, поэтому правка
+    поста, новый комментарий или переименование группы просто выпускают
+    новый ключ. Версии и записи читаются двумя `get_many`; версии
+    заводятся сигналами при сохранении поста, так что заново их создают
+    только найденные в базе посты, для которых их в кэше не оказалось.
+    """
+    version_keys = {
+        pk: caching.VERSION_KEY.format(caching.post_scope(pk))
+        for pk in ids}
+    groups_version = caching.listing_versions((caching.GROUPS,))
+    versions = cache.get_many(list(version_keys.values()))
+    keys = {
+        pk: BATCH_POST_KEY.format(pk, versions[key], groups_version)
+        for pk, key in version_keys.items() if key in versions}
+    found = cache.get_many(list(keys.values()))
+    data = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [pk for pk in ids if pk not in data]
+    if missing:
+        fetched = {
+            pk: serializers.post(post)
+            for pk, post in posts().in_bulk(missing).items()}
+        for pk in fetched.keys() - keys.keys():
+            keys[pk] = BATCH_POST_KEY.format(
+                pk, caching.listing_versions((caching.post_scope(pk),)),
+                groups_version)
+        cache.set_many(
+            {keys[pk]: item for pk, item in fetched.items()},
+            settings.API_POST_CACHE_TIMEOUT)
+        data.update(fetched)
+    return data
+
+
+@require_safe
+def posts_batch(request):
+    """Несколько постов за один запрос: ?ids=3,1,2 в заданном порядке.
+
+    Посты, которых нет, перечисляются в `not_found`.
+    """
+    try:
+        ids = parse_ids(request.GET.get('ids', ''))
+    except ValueError:
+        return bad_request('ids — список чисел через запятую.')
+    if len(ids) > settings.API_BATCH_LIMIT:
+        return bad_request(
+            f'Не больше {settings.API_BATCH_LIMIT} id за запрос.')
+    data = cached_posts(ids) if ids else {}
+    return respond({
+        'results': [data[pk] for pk in ids if pk in data],
+        'not_found': [pk for pk in ids if pk not in data],
+    })
+
+
+@require_safe
+@caching.cache_shared_page(lambda post_id: (caching.post_scope(post_id),))
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return not_found()
+    comments = Comment.objects.filter(post=post_id).select_related(
+        'author').only(*serializers.COMMENT_FIELDS)
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_ON_PAGE, date_field='created')
+    page = paginator.get_page(request.GET.get('cursor'))
+    return respond(serializers.page(page, serializers.comment, request.path))
+
+
+@require_safe
+def follow_feed(request):
+    """Лента подписок. Она своя у каждого, поэтому не кэшируется,
+    а ETag считается по содержимому: клиент с прежним ETag получает
+    304 без тела."""
+    if not request.user.is_authenticated:
+        return respond({'detail': 'Нужна авторизация.'}, status=401)
+    items = request.user.feed_items.only(
+        'pub_date', 'post_id',
+        *(f'post__{field}' for field in serializers.POST_FIELDS))
+    paginator = FeedPaginator(
+        items, settings.OBJ_ON_PAGES,
+        pulled_authors=feed.pulled_authors(request.user.id))
+    page = paginator.get_page(request.GET.get('cursor'))
+    response = respond(
+        serializers.page(page, serializers.post, request.path))
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        response = not_modified
+    response['ETag'] = etag
+    return response
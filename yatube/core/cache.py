@@ -0,0 +1,226 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STAMP_KEY = 'tiered-cache:stamp'
+
+
+class LocalTier:
+    """LRU в памяти процесса, ограниченное числом записей и байтами.
+
+    Значения хранятся в сериализованном виде: потоки процесса получают
+    каждый свою копию объекта, как и из общего кэша.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_bytes // 16
+        self.entries = OrderedDict()
+        self.size = 0
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires is not None and expires <= time.time():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def set(self, key, data, expires):
+        with self.lock:
+            self._pop(key)
+            if len(data) > self.max_item_bytes:
+                return
+            self.entries[key] = (expires, data)
+            self.size += len(data)
+            while (self.size > self.max_bytes
+                   or len(self.entries) > self.max_entries):
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def validate(self, stamp):
+        """Сбрасывает слой, если общий штамп изменился с прошлой проверки."""
+        with self.lock:
+            if stamp != self.stamp:
+                self.entries.clear()
+                self.size = 0
+                self.stamp = stamp
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: LRU процесса поверх общего для всех процессов.
+
+    Второй уровень задаётся псевдонимом другого кэша в OPTIONS['SHARED']
+    (например, FileBasedCache в общем каталоге). Любая запись и удаление
+    меняют штамп во втором уровне. Каждый процесс сверяет штамп один раз
+    за запрос, перед первым чтением из своего LRU, и при расхождении
+    сбрасывает его, поэтому устаревшее значение не переживает конца
+    запроса, в котором его заменили.
+
+    Во втором уровне значения лежат парами (срок, значение), и копия
+    в LRU живёт не дольше записи в общем кэше.
+    """
+
+    _tiers = {}
+    _tiers_lock = threading.Lock()
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        max_bytes = options.get('LOCAL_MAX_BYTES', 16 * 1024 * 1024)
+        with self._tiers_lock:
+            if location not in self._tiers:
+                self._tiers[location] = (
+                    LocalTier(max_entries, max_bytes),
+                    dict.fromkeys(
+                        ('local_hits', 'local_misses',
+                         'shared_hits', 'shared_misses'), 0))
+        self.local, self.counters = self._tiers[location]
+        self.validated = False
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def stats(self):
+        """Попадания и промахи каждого уровня в этом процессе."""
+        return dict(self.counters)
+
+    def _count(self, name, value=1):
+        self.counters[name] += value
+
+    def _validate(self):
+        if not self.validated:
+            self.local.validate(self.shared.get(STAMP_KEY))
+            self.validated = True
+
+    def _bump_stamp(self):
+        stamp = time.time_ns()
+        self.shared.set(STAMP_KEY, stamp, None)
+        self.local.validate(stamp)
+
+    def _remember(self, key, value, expires):
+        self.local.set(
+            key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        self._validate()
+        data = self.local.get(local_key)
+        if data is not None:
+            self._count('local_hits')
+            return pickle.loads(data)
+        self._count('local_misses')
+        entry = self.shared.get(key, None, version)
+        if entry is None:
+            self._count('shared_misses')
+            return default
+        self._count('shared_hits')
+        expires, value = entry
+        self._remember(local_key, value, expires)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._validate()
+        found = {}
+        missing = []
+        for key in keys:
+            data = self.local.get(self.make_key(key, version))
+            if data is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(data)
+        self._count('local_hits', len(found))
+        self._count('local_misses', len(missing))
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            self._count('shared_hits', len(shared))
+            self._count('shared_misses', len(missing) - len(shared))
+            for key, (expires, value) in shared.items():
+                self._remember(self.make_key(key, version), value, expires)
+                found[key] = value
+        return found
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        expires = self.get_backend_timeout(timeout)
+        added = self.shared.add(key, (expires, value), timeout, version)
+        if added:
+            # Копия в чужом LRU могла пережить вытеснение ключа.
+            self._bump_stamp()
+            self._remember(self.make_key(key, version), value, expires)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # Штамп меняется при любой записи: ключ мог истечь или быть
+        # вытеснен из общего кэша, а его копии в LRU процессов — нет.
+        timeout = self._timeout(timeout)
+        expires = self.get_backend_timeout(timeout)
+        self.shared.set_many(
+            {key: (expires, value) for key, value in data.items()},
+            timeout, version)
+        self._bump_stamp()
+        for key, value in data.items():
+            self._remember(self.make_key(key, version), value, expires)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        entry = self.shared.get(key, None, version)
+        if entry is None:
+            return False
+        self.set(key, entry[1], timeout, version)
+        return True
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        self._bump_stamp()
+
+    def has_key(self, key, version=None):
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        entry = self.shared.get(key, None, version)
+        if entry is None:
+            raise ValueError("Key '%s' not found" % key)
+        expires, value = entry
+        timeout = None if expires is None else max(expires - time.time(), 0)
+        self.set(key, value + delta, timeout, version)
+        return value + delta
+
+    def clear(self):
+        self.shared.clear()
+        self._bump_stamp()
+
+    def close(self, **kwargs):
+        self.validated = False
+        self.shared.close(**kwargs)
@@ -0,0 +1,26 @@
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+HOLE = '<!--personal:{}-->'
+
+
+def open_holes(request):
+    """Включает режим, в котором личные фрагменты заменяются метками."""
+    request.personal_holes = []
+    return request.personal_holes
+
+
+def close_holes(request):
+    del request.personal_holes
+
+
+def fill_holes(request, response, holes):
+    """Вставляет в общую страницу фрагменты, отрендеренные для request."""
+    content = response.content.decode(response.charset)
+    for number, (template_name, params) in enumerate(holes):
+        content = content.replace(
+            HOLE.format(number),
+            render_to_string(template_name, params, request=request))
+    response.content = content
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -0,0 +1,24 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.personal import HOLE
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personal(context, template_name, **params):
+    """Подключает шаблон, который зависит от пользователя.
+
+    Обычно работает как `{% include %}`. Если страница кэшируется целиком,
+    вместо фрагмента ставится метка: общая страница сохраняется один раз
+    для всех, а фрагмент рендерится для каждого запроса отдельно.
+    """
+    request = context.get('request')
+    holes = getattr(request, 'personal_holes', None)
+    if holes is None:
+        with context.push(**params):
+            return context.template.engine.get_template(
+                template_name).render(context)
+    holes.append((template_name, params))
+    return mark_safe(HOLE.format(len(holes) - 1))
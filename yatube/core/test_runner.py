@@ -0,0 +1,44 @@
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def isolated_cache(**overrides):
+    """Подменяет общий кэш и замки перестройки временным каталогом.
+
+    Тесты постоянно чистят кэш, а общий кэш сайта лежит в общем для
+    всех процессов машины каталоге: без подмены прогон тестов сбрасывал
+    бы его запущенному рядом сайту.
+    """
+    root = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    caches[settings.CACHES['default']['OPTIONS']['SHARED']][
+        'LOCATION'] = root
+    try:
+        with override_settings(
+                CACHES=caches,
+                STAMPEDE_LOCK_DIR=os.path.join(root, 'locks'),
+                **overrides):
+            yield
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с отдельным общим кэшем (см. `isolated_cache`)."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache = isolated_cache()
+        self.cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
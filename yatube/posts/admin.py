@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Post, Group
+from .paginators import ApproximateCountPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,10 +14,33 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Список групп выбирается один раз на запрос, а не для каждой
+        строки с `list_editable`."""
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group' and request is not None:
+            if not hasattr(request, 'group_choices'):
+                request.group_choices = list(iter(field.choices))
+            field.choices = request.group_choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу FTS5 вместо LIKE по всей таблице."""
+        expression = search.match_expression(search_term)
+        if not expression:
+            return queryset, False
+        matches = RawSQL(
+            f'SELECT rowid FROM {search.TABLE} '
+            f'WHERE {search.TABLE} MATCH %s', (expression,))
+        return queryset.filter(pk__in=matches), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -24,8 +50,10 @@ class GroupAdmin(admin.ModelAdmin):
         'slug',
         'description',
     )
-    search_fields = ('text',)
+    search_fields = ('title', '=slug')
     empty_value_display = '-пусто-'
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
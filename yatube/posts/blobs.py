@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+from .storage import is_hashed
+
+
+def acquire(name):
+    """Отмечает, что ещё один пост ссылается на файл."""
+    if not is_hashed(name):
+        return
+    ImageBlob.objects.get_or_create(name=name)
+    ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Снимает ссылку; файл без ссылок удаляется вместе с миниатюрами."""
+    if not is_hashed(name):
+        return
+    ImageBlob.objects.filter(name=name, refs__gte=1).update(
+        refs=F('refs') - 1)
+    deleted, _ = ImageBlob.objects.filter(name=name, refs=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: _collect(name))
+
+
+def _collect(name):
+    # Пока удаление ждало коммита, тот же файл мог загрузиться снова.
+    if not ImageBlob.objects.filter(name=name).exists():
+        storage = Post._meta.get_field('image').storage
+        delete_with_thumbnails(ImageFile(name, storage))
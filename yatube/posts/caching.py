@@ -0,0 +1,260 @@
+import fcntl
+import hashlib
+import math
+import os
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, quote_etag)
+from django.utils.http import http_date
+
+from core.personal import close_holes, fill_holes, open_holes
+
+VERSION_KEY = 'listing-version:{}'
+PAGE_KEY = 'page:{}:{}'
+STALE_KEY = 'stale:{}'
+CARD_KEY = 'post-card:{}:{}:{}:{}:{}'
+INDEX = 'index'
+GROUPS = 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def following_scope(user_id):
+    return f'following:{user_id}'
+
+
+def post_scopes(post, group_slugs=()):
+    """Области страниц, на которых показывается пост."""
+    scopes = [INDEX, post_scope(post.pk), profile_scope(post.author.username)]
+    scopes.extend(group_scope(slug) for slug in group_slugs)
+    return scopes
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def listing_versions(scopes):
+    """Возвращает текущие версии областей, заводя недостающие."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_listings(scopes):
+    """Сбрасывает кэш списков, меняя версии их областей."""
+    version = _new_version()
+    cache.set_many(
+        {VERSION_KEY.format(scope): version for scope in scopes}, None)
+
+
+def _stampede_cache():
+    return caches[settings.STAMPEDE_CACHE]
+
+
+def _lock_path(key):
+    name = hashlib.md5(key.encode()).hexdigest()
+    return os.path.join(settings.STAMPEDE_LOCK_DIR, f'{name}.lock')
+
+
+def _acquire(key):
+    """Берёт замок перестройки ключа, общий для всех процессов машины.
+
+    Возвращает дескриптор файла замка или None, если замок занят.
+    flock атомарен между процессами и снимается ядром, если владелец
+    упал, так что брошенных замков не остаётся. Владелец удаляет файл
+    при освобождении, поэтому после захвата проверяется, что запертый
+    файл всё ещё лежит по своему пути.
+    """
+    path = _lock_path(key)
+    os.makedirs(settings.STAMPEDE_LOCK_DIR, exist_ok=True)
+    fd = os.open(path, os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if os.path.samestat(os.fstat(fd), os.stat(path)):
+            return fd
+    except OSError:
+        pass
+    os.close(fd)
+    return None
+
+
+def _release(key, fd):
+    os.unlink(_lock_path(key))
+    os.close(fd)
+
+
+@contextmanager
+def exclusive(key):
+    """Выполняет блок, пока никто на машине не держит замок `key`."""
+    lock = _acquire(key)
+    while lock is None:
+        time.sleep(settings.STAMPEDE_POLL_INTERVAL)
+        lock = _acquire(key)
+    try:
+        yield
+    finally:
+        _release(key, lock)
+
+
+def _refresh_due(entry):
+    """Решает, пора ли обновить запись, не дожидаясь её истечения.
+
+    Вероятность растёт к моменту истечения и со временем, которое
+    заняло построение записи (XFetch), так что долгие страницы обычно
+    обновляет один запрос заранее, а не все разом в момент истечения.
+    """
+    expires, delta = entry[0], entry[1]
+    early = -delta * settings.EARLY_REFRESH_BETA * math.log(
+        1 - random.random())
+    return time.time() + early >= expires
+
+
+def single_flight(key, build, timeout, stale_key=None):
+    """Достаёт значение из кэша, перестраивая его в одном месте сразу.
+
+    `build` возвращает пару (значение, можно ли его кэшировать). Пока
+    один запрос перестраивает ключ, остальные отдают прежнее значение,
+    а если его нет, ждут до STAMPEDE_WAIT секунд и только потом строят
+    сами. Прежнее значение ищется под тем же ключом и под `stale_key`,
+    который переживает смену версий в ключе.
+    """
+    stale_key = STALE_KEY.format(stale_key or key)
+    entry = cache.get(key)
+    if entry is not None and not _refresh_due(entry):
+        return entry[2]
+    deadline = time.monotonic() + settings.STAMPEDE_WAIT
+    lock = _acquire(key)
+    while lock is None:
+        if entry is None:
+            entry = cache.get(key) or _stampede_cache().get(stale_key)
+        if entry is not None:
+            return entry[2]
+        if time.monotonic() >= deadline:
+            return build()[0]
+        time.sleep(settings.STAMPEDE_POLL_INTERVAL)
+        lock = _acquire(key)
+    try:
+        current = cache.get(key)
+        if current is not None and (
+                entry is None or current[0] != entry[0]):
+            return current[2]
+        started = time.monotonic()
+        value, cacheable = build()
+        if cacheable:
+            fresh = (
+                time.time() + timeout, time.monotonic() - started, value)
+            cache.set(key, fresh, timeout)
+            _stampede_cache().set(stale_key, fresh, timeout * 2)
+        return value
+    finally:
+        _release(key, lock)
+
+
+def page_path(request):
+    return hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+
+def validators(request, versions):
+    """ETag и Last-Modified страницы по версиям её областей.
+
+    Версия области — это время её последнего изменения, так что самая
+    поздняя из них годится в Last-Modified. В ETag входит и посетитель:
+    личные фрагменты у каждого свои.
+    """
+    etag = hashlib.md5(
+        f'{versions}:{request.user.pk}'.encode()).hexdigest()
+    last_modified = max(int(version) for version in versions.split('.'))
+    return f'W/{quote_etag(etag)}', last_modified // 10 ** 9
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, max_age=0)
+    return response
+
+
+def cache_shared_page(scopes):
+    """Кэширует страницу до изменения данных в её областях.
+
+    `scopes` получает аргументы представления и возвращает имена
+    областей или None, если страницу кэшировать не нужно. Ключ страницы
+    включает версии областей, поэтому сигналы о смене постов и групп
+    просто выпускают новые версии, а старые записи вытесняются сами.
+
+    В кэш попадает одна общая для всех страница: фрагменты из тега
+    `{% personal %}` заменяются метками и рендерятся для каждого
+    запроса заново, так что шапка и CSRF-токен у каждого свои.
+
+    Страницу перестраивает один запрос, остальные тем временем получают
+    прежнюю версию той же страницы (см. `single_flight`) с её прежними
+    валидаторами, чтобы клиент не закэшировал её под новым ETag.
+
+    Версии областей служат и валидаторами: повторный запрос с прежним
+    ETag или If-Modified-Since получает 304 без запросов к страницам
+    и рендеринга.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_scopes = scopes(*args, **kwargs)
+            if page_scopes is None:
+                return view(request, *args, **kwargs)
+            versions = listing_versions((GROUPS, *page_scopes))
+            etag, last_modified = validators(request, versions)
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return set_validators(not_modified, etag, last_modified)
+
+            def build():
+                holes = open_holes(request)
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    close_holes(request)
+                cacheable = (
+                    response.status_code == 200 and not response.cookies)
+                return (response, holes, versions), cacheable
+
+            path = page_path(request)
+            response, holes, built = single_flight(
+                PAGE_KEY.format(path, versions), build,
+                settings.LISTING_CACHE_TIMEOUT, PAGE_KEY.format(path, 'last'))
+            response = fill_holes(request, response, holes)
+            if response.status_code == 200:
+                set_validators(response, *validators(request, built))
+            return response
+        return wrapper
+    return decorator
+
+
+def card_key(post, variant, groups_version):
+    """Ключ карточки поста: меняется при правке поста, новом комментарии
+    и изменении групп."""
+    return CARD_KEY.format(
+        variant, post.pk, post.edited.timestamp(), post.comments_count,
+        groups_version)
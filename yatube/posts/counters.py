@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile, User
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_profile(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя, при нужде создавая профиль."""
+    updated = _bump(Profile.objects.filter(pk=user_id), field, delta)
+    if not updated and delta > 0:
+        recount_profile(user_id)
+
+
+def bump_post(post_id, field, delta):
+    _bump(Post.objects.filter(pk=post_id), field, delta)
+
+
+def recount_profile(user_id):
+    """Пересчитывает счётчики одного пользователя и возвращает профиль."""
+    profile, _ = Profile.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author=user_id).count(),
+            'following_count': Follow.objects.filter(user=user_id).count(),
+        })
+    return profile
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(rows.values(field).annotate(
+            total=Count('pk')).values('total')),
+        0)
+
+
+def recount():
+    """Пересчитывает все счётчики несколькими UPDATE на таблицу."""
+    missing = User.objects.filter(
+        profile__isnull=True).values_list('pk', flat=True)
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True)
+    Profile.objects.update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
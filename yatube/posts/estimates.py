@@ -0,0 +1,117 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+COUNT_KEY = 'estimated-count:{}'
+REFRESH_KEY = 'estimated-count-refresh:{}'
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='estimates')
+    return _executor
+
+
+def index_stat(table, index):
+    """Статистика индекса из sqlite_stat1 списком чисел или None.
+
+    Первое число — строк в таблице, следующие — сколько строк в среднем
+    приходится на одно значение первых 1, 2, ... полей индекса.
+    Таблица статистики появляется после ANALYZE.
+    """
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx = %s',
+                [table, index])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    return [int(value) for value in row[0].split() if value.isdigit()]
+
+
+def _cache():
+    # Оценки живут только в общем кэше: их перезапись раз в
+    # ESTIMATED_COUNT_TTL не должна сбрасывать LRU процессов.
+    return caches[settings.STAMPEDE_CACHE]
+
+
+def _refresh(scope, queryset):
+    try:
+        _cache().set(
+            COUNT_KEY.format(scope),
+            (queryset.count(), time.time() + settings.ESTIMATED_COUNT_TTL),
+            None)
+    except Exception:
+        logger.exception('Не удалось пересчитать строки области %s', scope)
+    finally:
+        with caching.exclusive(REFRESH_KEY.format(scope)):
+            _cache().delete(REFRESH_KEY.format(scope))
+        connection.close()
+
+
+def _claim(scope):
+    """Берёт пересчёт области на себя, если его не ведёт другой процесс.
+
+    add файлового кэша — это проверка и запись по отдельности, поэтому
+    пара выполняется под общим для процессов замком.
+    """
+    key = REFRESH_KEY.format(scope)
+    with caching.exclusive(key):
+        if _cache().has_key(key):
+            return False
+        _cache().set(key, True, settings.ESTIMATED_COUNT_TTL)
+        return True
+
+
+def scope_count(scope, queryset, fallback=None):
+    """Число строк области по последнему фоновому пересчёту.
+
+    Устаревшее значение отдаётся сразу, а COUNT(*) выполняется в фоне
+    после коммита, один на область за раз. Пока пересчёта не было,
+    возвращается `fallback` — функция дешёвой оценки или None.
+    """
+    entry = _cache().get(COUNT_KEY.format(scope))
+    if entry is None or entry[1] <= time.time():
+        if _claim(scope):
+            transaction.on_commit(
+                lambda: _get_executor().submit(
+                    _refresh, scope, queryset.all()))
+    if entry is not None:
+        return entry[0]
+    return fallback() if fallback is not None else None
+
+
+def posts_count():
+    """Оценка числа всех постов: фоновый пересчёт, статистика или id."""
+    def fallback():
+        stat = index_stat(Post._meta.db_table, 'post_date_idx')
+        if stat:
+            return stat[0]
+        return Post.objects.aggregate(top=Max('pk'))['top'] or 0
+    return scope_count(caching.INDEX, Post.objects.all(), fallback)
+
+
+def group_posts_count(group):
+    """Оценка числа постов группы; до пересчёта — среднее по группам."""
+    def fallback():
+        stat = index_stat(Post._meta.db_table, 'post_group_date_idx')
+        return stat[1] if stat and len(stat) > 1 else None
+    return scope_count(
+        caching.group_scope(group.slug), group.posts.all(), fallback)
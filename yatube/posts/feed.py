@@ -0,0 +1,81 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import FeedItem, Follow, Post, Profile, PulledAuthor
+
+
+def _bulk_push(items):
+    """Пишет записи ленты пачками, не собирая их все в памяти."""
+    items = iter(items)
+    batch = list(islice(items, settings.FEED_BATCH_SIZE))
+    while batch:
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(items, settings.FEED_BATCH_SIZE))
+
+
+def is_pulled(author_id):
+    return PulledAuthor.objects.filter(author=author_id).exists()
+
+
+def pulled_authors(user_id):
+    """id авторов из подписок, чьи посты читаются при открытии ленты."""
+    return list(PulledAuthor.objects.filter(
+        author__following__user=user_id).values_list('author', flat=True))
+
+
+def push_post(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора.
+
+    Автор, у которого подписчиков больше FEED_PUSH_THRESHOLD, переводится
+    в режим чтения: его посты больше не рассылаются, а подмешиваются
+    в ленту при чтении. Переход необратим, чтобы в лентах не оставалось
+    дыр от постов, опубликованных без рассылки.
+    """
+    if is_pulled(post.author_id):
+        return
+    threshold = settings.FEED_PUSH_THRESHOLD
+    if threshold is not None and Profile.objects.filter(
+            user=post.author_id, followers_count__gt=threshold).exists():
+        PulledAuthor.objects.get_or_create(author_id=post.author_id)
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id).values_list('user', flat=True)
+    _bulk_push(
+        FeedItem(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date)
+        for user_id in followers.iterator())
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(
+        author=author_id).values_list('pk', 'pub_date')
+    _bulk_push(
+        FeedItem(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date)
+        for post_id, pub_date in posts.iterator())
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого отписались."""
+    FeedItem.objects.filter(user=user_id, author=author_id).delete()
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Собирает ленту пользователя заново по его подпискам."""
+    FeedItem.objects.filter(user=user_id).delete()
+    authors = Follow.objects.filter(
+        user=user_id).values_list('author', flat=True)
+    for author_id in authors:
+        backfill(user_id, author_id)
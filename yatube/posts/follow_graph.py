@@ -0,0 +1,126 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+from .models import Follow
+
+# 8 байт на подписку против ~60 у множества из int.
+TYPECODE = 'q'
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def _contains(authors, author_id):
+    position = bisect_left(authors, author_id)
+    return position < len(authors) and authors[position] == author_id
+
+
+class FollowGraph:
+    """Подписки пользователей в памяти процесса.
+
+    Для каждого пользователя хранится отсортированный массив id авторов,
+    на которых он подписан; массив читается из базы одним запросом при
+    первом обращении и потом отвечает на проверки бинарным поиском.
+    Рядом с массивом лежит версия области `following_scope` из кэша:
+    сигналы подписки и отписки выпускают новую версию, и каждый процесс
+    при следующей проверке перечитывает массив этого пользователя.
+    Число пользователей ограничено `max_users`, давно не читанные
+    вытесняются.
+    """
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'loads', 'invalidations'), 0)
+
+    def _version(self, user_id):
+        return caching.listing_versions((caching.following_scope(user_id),))
+
+    def following(self, user_id):
+        """Отсортированный массив id авторов, на которых подписан user_id."""
+        version = self._version(user_id)
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is not None and entry[0] == version:
+                self.users.move_to_end(user_id)
+                self.counters['hits'] += 1
+                return entry[1]
+        authors = array(TYPECODE, Follow.objects.filter(
+            user=user_id).order_by('author').values_list('author', flat=True))
+        with self.lock:
+            self.counters['loads'] += 1
+            self._store(user_id, version, authors)
+        return authors
+
+    def invalidate(self, user_id):
+        """Сбрасывает массив пользователя в этом и в других процессах.
+
+        Версия меняется сразу, чтобы подписка была видна до конца
+        транзакции, и ещё раз после коммита: иначе процесс, перечитавший
+        подписки до коммита, сохранил бы прежние под новой версией.
+        """
+        self._forget(user_id)
+        transaction.on_commit(lambda: self._forget(user_id))
+
+    def _forget(self, user_id):
+        caching.bump_listings((caching.following_scope(user_id),))
+        with self.lock:
+            self.users.pop(user_id, None)
+            self.counters['invalidations'] += 1
+
+    def _store(self, user_id, version, authors):
+        self.users[user_id] = (version, authors)
+        self.users.move_to_end(user_id)
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+    def stats(self):
+        """Размер индекса в этом процессе и счётчики обращений."""
+        with self.lock:
+            arrays = [authors for _, authors in self.users.values()]
+            return {
+                'users': len(arrays),
+                'edges': sum(len(authors) for authors in arrays),
+                'bytes': sys.getsizeof(self.users) + sum(
+                    sys.getsizeof(authors) for authors in arrays),
+                **self.counters,
+            }
+
+
+graph = FollowGraph(settings.FOLLOW_GRAPH_MAX_USERS)
+
+
+def is_following(user, author):
+    """Подписан ли пользователь на автора; принимает объекты или id."""
+    user_id = _pk(user)
+    if user_id is None:
+        return False
+    return _contains(graph.following(user_id), _pk(author))
+
+
+def following_set(user, authors):
+    """Те из `authors`, на кого подписан пользователь, множеством id."""
+    user_id = _pk(user)
+    if user_id is None:
+        return set()
+    following = graph.following(user_id)
+    return {
+        author_id for author_id in map(_pk, authors)
+        if _contains(following, author_id)}
+
+
+def stats():
+    return graph.stats()
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import ImageRejected, sanitize
 from .models import Post, Comment
 
 
@@ -12,6 +14,15 @@ class PostForm(forms.ModelForm):
             'group': 'Укажите группу',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return sanitize(image)
+        except ImageRejected as error:
+            raise forms.ValidationError(str(error))
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,179 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+METADATA_FIELDS = (
+    'image_width', 'image_height', 'image_size', 'image_mime', 'image_hash')
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+_pool = None
+
+
+class ImageRejected(Exception):
+    pass
+
+
+def read_metadata(file):
+    """Размеры, объём, MIME-тип и SHA-256 картинки.
+
+    Pillow читает только заголовок, содержимое проходит через хэш
+    кусками, так что файл целиком в памяти не держится.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        mime = Image.MIME.get(image.format, '')
+    file.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': size,
+        'image_mime': mime,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def clear_metadata(post):
+    post.image_width = post.image_height = post.image_size = None
+    post.image_mime = post.image_hash = ''
+
+
+def fill_metadata(post):
+    """Записывает в пост метаданные только что загруженной картинки."""
+    if not post.image:
+        clear_metadata(post)
+    elif not post.image._committed:
+        try:
+            metadata = read_metadata(post.image.file)
+        except OSError:
+            clear_metadata(post)
+            return
+        for field, value in metadata.items():
+            setattr(post, field, value)
+
+
+def check_header(file):
+    """Проверяет объём, формат и число пикселей, не декодируя картинку.
+
+    Возвращает формат картинки.
+    """
+    if file.size > settings.POST_IMAGE_MAX_BYTES:
+        raise ImageRejected(
+            f'Файл больше {settings.POST_IMAGE_MAX_BYTES // 2 ** 20} МБ')
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image_format = image.format
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise ImageRejected('Слишком много пикселей в картинке')
+    except OSError:
+        raise ImageRejected('Не удалось прочитать картинку')
+    finally:
+        file.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ImageRejected(f'Формат {image_format} не поддерживается')
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ImageRejected(
+            f'Картинка {width}x{height} больше '
+            f'{settings.POST_IMAGE_MAX_PIXELS // 10 ** 6} Мп')
+    return image_format
+
+
+def _limit_memory(budget):
+    """Ограничивает адресное пространство процесса-обработчика."""
+    try:
+        import resource
+        with open('/proc/self/statm') as statm:
+            used = int(statm.read().split()[0]) * resource.getpagesize()
+    except (ImportError, OSError):
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (used + budget, used + budget))
+
+
+def _reencode(source, target, image_format, max_pixels):
+    """Пересохраняет картинку без EXIF; выполняется в процессе пула."""
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(source) as image:
+        options = {}
+        if getattr(image, 'is_animated', False):
+            options['save_all'] = True
+        else:
+            image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG':
+            if image.mode not in ('RGB', 'L', 'CMYK'):
+                image = image.convert('RGB')
+            options.update(quality=90, optimize=True)
+        image.save(target, image_format, **options)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.POST_IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_limit_memory,
+            initargs=(settings.POST_IMAGE_WORKER_MEMORY,))
+    return _pool
+
+
+def sanitize(upload):
+    """Проверяет загрузку и возвращает её копию, пересохранённую без EXIF.
+
+    Расширение имени берётся из настоящего формата картинки: по нему
+    хранилище и sorl выбирают формат файла и миниатюр.
+
+    Django уже сложил файл во временный каталог кусками; полное
+    декодирование идёт в отдельном процессе с ограничением памяти,
+    так что картинка-бомба роняет только его, а не обработчик запроса.
+    """
+    global _pool
+    image_format = check_header(upload)
+    target = tempfile.NamedTemporaryFile(
+        suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR)
+    copied = not hasattr(upload, 'temporary_file_path')
+    if copied:
+        source = f'{target.name}.source'
+        with open(source, 'wb') as copy:
+            shutil.copyfileobj(upload, copy)
+    else:
+        source = upload.temporary_file_path()
+    try:
+        _get_pool().submit(
+            _reencode, source, target.name, image_format,
+            settings.POST_IMAGE_MAX_PIXELS,
+        ).result(timeout=settings.POST_IMAGE_TIMEOUT)
+    except BrokenProcessPool:
+        _pool = None
+        raise ImageRejected('Картинку не удалось обработать')
+    except FutureTimeoutError:
+        raise ImageRejected('Картинка обрабатывается слишком долго')
+    except MemoryError:
+        raise ImageRejected('Картинке не хватило памяти при обработке')
+    except Exception:
+        raise ImageRejected('Не удалось прочитать картинку')
+    finally:
+        if copied:
+            os.remove(source)
+    target.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return UploadedFile(
+        target, f'{stem}.{EXTENSIONS[image_format]}',
+        Image.MIME[image_format], os.path.getsize(target.name))
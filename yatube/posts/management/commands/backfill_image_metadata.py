@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import METADATA_FIELDS, read_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает размеры, объём, тип и хэш картинок постов, '
+        'загруженных до появления этих полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_hash='').only('pk', 'image').order_by('pk')
+        last_pk = 0
+        filled = failed = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = []
+            for post in batch:
+                try:
+                    with post.image.open('rb') as file:
+                        metadata = read_metadata(file)
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(f'{post.image.name}: {error}')
+                    continue
+                for field, value in metadata.items():
+                    setattr(post, field, value)
+                changed.append(post)
+            Post.objects.bulk_update(changed, METADATA_FIELDS)
+            filled += len(changed)
+        self.stdout.write(
+            f'Заполнено постов: {filled}, не удалось прочитать: {failed}')
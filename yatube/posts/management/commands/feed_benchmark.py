@@ -0,0 +1,133 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from posts import counters, feed
+from posts.models import FeedItem, Follow, Post, User
+from posts.paginators import FeedPaginator
+
+STRATEGIES = (
+    ('push', None),
+    ('pull', -1),
+    ('hybrid', 'threshold'),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рассылку, чтение и гибридную ленту подписок '
+        'на синтетическом графе. Все данные откатываются по завершении.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--celebrities', type=int, default=5)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Подписок на обычных авторов у каждого пользователя.')
+        parser.add_argument(
+            '--celebrity-reach', type=float, default=0.6,
+            help='Доля пользователей, подписанных на каждую знаменитость.')
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--readers', type=int, default=50)
+        parser.add_argument('--pages', type=int, default=3)
+        parser.add_argument('--threshold', type=int, default=100)
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rnd = random.Random(options['seed'])
+        users = self.make_graph(rnd, options)
+        authors = [rnd.choice(users[options['celebrities']:])
+                   for _ in range(options['posts'])]
+        for index in range(len(authors) // 5):
+            authors[index * 5] = rnd.choice(users[:options['celebrities']])
+        readers = rnd.sample(users, options['readers'])
+
+        self.stdout.write(
+            f'{"стратегия":<10}{"запись, с":>12}{"строк ленты":>14}'
+            f'{"чтение, мс":>14}{"запросов":>12}')
+        for name, threshold in STRATEGIES:
+            if threshold == 'threshold':
+                threshold = options['threshold']
+            try:
+                with transaction.atomic(), override_settings(
+                        FEED_PUSH_THRESHOLD=threshold):
+                    self.measure(name, authors, readers, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def make_graph(self, rnd, options):
+        User.objects.bulk_create(
+            User(username=f'feed-benchmark-{number}')
+            for number in range(options['users']))
+        users = list(User.objects.filter(
+            username__startswith='feed-benchmark-').values_list(
+                'pk', flat=True))
+        celebrities = users[:options['celebrities']]
+        regular = users[options['celebrities']:]
+        follows = set()
+        for user_id in users:
+            for author_id in rnd.sample(regular, options['follows']):
+                follows.add((user_id, author_id))
+            for author_id in celebrities:
+                if rnd.random() < options['celebrity_reach']:
+                    follows.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in follows if user_id != author_id)
+        counters.recount()
+        return users
+
+    def measure(self, name, authors, readers, options):
+        started = time.perf_counter()
+        for author_id in authors:
+            Post.objects.create(author_id=author_id, text=name)
+        write_time = time.perf_counter() - started
+        rows = FeedItem.objects.count()
+
+        read_time = 0
+        queries = QueryCounter()
+        reads = 0
+        for user_id in readers:
+            cursor = None
+            for _ in range(options['pages']):
+                with connection.execute_wrapper(queries):
+                    started = time.perf_counter()
+                    paginator = FeedPaginator(
+                        FeedItem.objects.filter(user=user_id),
+                        options['per_page'],
+                        pulled_authors=feed.pulled_authors(user_id))
+                    page = paginator.get_page(cursor)
+                    read_time += time.perf_counter() - started
+                reads += 1
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+        self.stdout.write(
+            f'{name:<10}{write_time:>12.2f}{rows:>14}'
+            f'{read_time / reads * 1000:>14.2f}{queries.count / reads:>12.1f}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры для уже загруженных картинок.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').values_list('pk', flat=True)
+        for post_id in posts.iterator():
+            thumbnails.generate(post_id)
+        self.stdout.write(f'Обработано постов: {posts.count()}')
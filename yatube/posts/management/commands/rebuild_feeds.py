@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей.')
+
+    def handle(self, *args, **options):
+        followers = Follow.objects.order_by().values_list(
+            'user', flat=True).distinct()
+        if options['usernames']:
+            followers = followers.filter(
+                user__username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in followers.iterator():
+            feed.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(f'Пересобрано лент: {rebuilt}')
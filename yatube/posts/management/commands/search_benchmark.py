@@ -0,0 +1,90 @@
+import random
+import time
+from itertools import accumulate, islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post, User
+from posts.paginators import SearchPaginator
+
+SYLLABLES = (
+    'ка', 'ко', 'ли', 'ма', 'не', 'ро', 'та', 'ве', 'зи', 'пу', 'да', 'ше')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по индексу FTS5 с LIKE по всей таблице постов '
+        'на синтетических данных. Все данные откатываются по завершении.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--words', type=int, default=20)
+        parser.add_argument('--vocabulary', type=int, default=50000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rnd = random.Random(options['seed'])
+        vocabulary = sorted({
+            ''.join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4)))
+            for _ in range(options['vocabulary'])})
+        weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(vocabulary))))
+        author = User.objects.create(username='search-benchmark')
+
+        started = time.perf_counter()
+        posts = (
+            Post(author=author, text=' '.join(rnd.choices(
+                vocabulary, cum_weights=weights, k=options['words'])))
+            for _ in range(options['posts']))
+        while True:
+            batch = list(islice(posts, options['batch_size']))
+            if not batch:
+                break
+            Post.objects.bulk_create(batch)
+        self.stdout.write(
+            f'Постов: {options["posts"]}, '
+            f'запись: {time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        search.rebuild()
+        self.stdout.write(
+            f'Построение индекса: {time.perf_counter() - started:.1f} с')
+
+        # Слова из головы, середины и хвоста распределения частот.
+        terms = [
+            vocabulary[int(len(vocabulary) * rnd.random() ** 3)]
+            for _ in range(options['queries'])]
+        self.stdout.write(
+            f'{"способ":<10}{"среднее, мс":>14}{"худшее, мс":>14}')
+        for name, query in (('fts5', self.fts), ('like', self.like)):
+            timings = []
+            for term in terms:
+                started = time.perf_counter()
+                query(term, options['per_page'])
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'{name:<10}{sum(timings) / len(timings) * 1000:>14.1f}'
+                f'{max(timings) * 1000:>14.1f}')
+
+    def fts(self, term, per_page):
+        return list(SearchPaginator(term, per_page).get_page(None))
+
+    def like(self, term, per_page):
+        return list(Post.objects.select_related('author', 'group').filter(
+            text__icontains=term).order_by('-pub_date', '-id')[:per_page])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+from posts.models import Follow, Suggestion
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «на кого подписаться» для тех, '
+        'у кого с прошлого запуска изменился второй круг подписок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать рекомендации всех пользователей.')
+
+    def handle(self, *args, **options):
+        changed = suggestions.take_changed()
+        if options['all']:
+            users = set(changed)
+            for model in (Follow, Suggestion):
+                users.update(model.objects.order_by().values_list(
+                    'user', flat=True).distinct().iterator())
+        else:
+            users = suggestions.affected_users(changed)
+        updated = suggestions.recompute(users)
+        self.stdout.write(f'Пересчитано рекомендаций: {updated}')
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0008_feeditem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PulledAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pulled', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('since', models.DateTimeField(auto_now_add=True, verbose_name='Читается из постов с')),
+            ],
+            options={
+                'verbose_name': 'Автор без рассылки',
+                'verbose_name_plural': 'Авторы без рассылки',
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(rows.values(field).annotate(
+            total=Count('pk')).values('total')),
+        0)
+
+
+def recount(apps, schema_editor):
+    """Заводит профили и считает счётчики по уже накопленным данным."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('posts', 'Profile')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+
+    missing = User.objects.filter(
+        profile__isnull=True).values_list('pk', flat=True)
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+    Profile.objects.update(
+        posts_count=count(Post, 'author'),
+        followers_count=count(Follow, 'author'),
+        following_count=count(Follow, 'user'))
+    Post.objects.update(comments_count=count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_profile_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount, migrations.RunPython.noop),
+    ]
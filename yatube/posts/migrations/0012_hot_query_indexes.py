@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-17 13:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(rows.values(field).annotate(
+            total=Count('pk')).values('total')),
+        0)
+
+
+def delete_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+    duplicates = Follow.objects.values('user', 'author').order_by().annotate(
+        keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    if not duplicates:
+        return
+    for row in duplicates:
+        Follow.objects.filter(
+            user=row['user'], author=row['author']).exclude(
+                id=row['keep']).delete()
+    Profile.objects.update(
+        followers_count=count(Follow, 'author'),
+        following_count=count(Follow, 'user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_recount_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(
+            delete_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
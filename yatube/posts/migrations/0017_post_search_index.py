@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_suggestions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+            "text, tokenize='unicode61 remove_diacritics 2')",
+            'DROP TABLE posts_post_fts'),
+        # «ё» приводится к «е», как в posts.search.normalize.
+        migrations.RunSQL(
+            "INSERT INTO posts_post_fts (rowid, text) SELECT id, "
+            "replace(replace(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post",
+            migrations.RunSQL.noop),
+    ]
@@ -24,12 +24,40 @@ class Group(models.Model):
         return self.title
 
 
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+        verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок')
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста')
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата написания')
+    edited = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения')
     group = models.ForeignKey(
         Group,
         blank=True,
@@ -47,6 +75,36 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ширина картинки')
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Высота картинки')
+    image_size = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Размер картинки, байт')
+    image_mime = models.CharField(
+        max_length=50,
+        blank=True,
+        editable=False,
+        verbose_name='Тип картинки')
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='SHA-256 картинки')
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев')
 
     def __str__(self):
         return self.text[:NUMBER_OF_LETTERS]
@@ -55,6 +113,17 @@ class Post(models.Model):
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_date_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx'),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx'),
+        )
 
 
 class Comment(models.Model):
@@ -80,6 +149,11 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'),
+        )
 
 
 class Follow(models.Model):
@@ -93,3 +167,124 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
         verbose_name='Автор')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'),
+        )
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Читатель')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата написания')
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_feed_item'),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_date_idx'),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'),
+        )
+
+
+class PulledAuthor(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pulled',
+        verbose_name='Автор')
+    since = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Читается из постов с')
+
+    class Meta:
+        verbose_name = 'Автор без рассылки'
+        verbose_name_plural = 'Авторы без рассылки'
+
+
+class ImageBlob(models.Model):
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name='Файл')
+    refs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок из постов')
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+
+class Suggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name='Кому')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    score = models.PositiveIntegerField(
+        verbose_name='Общих подписок')
+
+    class Meta:
+        ordering = ('-score', 'author')
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_suggestion'),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-score', 'author'),
+                name='suggestion_user_score_idx'),
+        )
+
+
+class FollowChange(models.Model):
+    # Без внешнего ключа: отписки при удалении пользователя тоже оставляют
+    # отметку, и она не должна мешать удалить его строку.
+    user = models.OneToOneField(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Подписчик')
+    since = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Подписки изменились')
+
+    class Meta:
+        verbose_name = 'Изменившиеся подписки'
+        verbose_name_plural = 'Изменившиеся подписки'
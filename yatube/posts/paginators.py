@@ -0,0 +1,350 @@
+import heapq
+import math
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import search
+from .models import Post
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+FORWARD = 'n'
+BACKWARD = 'p'
+LAST_PAGE = 'last'
+# Наибольший id, который SQLite хранит в INTEGER.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(direction, position):
+    """Упаковывает позицию (дата, id) в непрозрачный токен для URL."""
+    date, pk = position
+    raw = f'{direction}{(date - EPOCH) // MICROSECOND}.{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Распаковывает токен; для битого токена возвращает None."""
+    try:
+        raw = urlsafe_base64_decode(cursor).decode()
+        direction, raw = raw[0], raw[1:]
+        microseconds, pk = raw.split('.')
+        position = (EPOCH + int(microseconds) * MICROSECOND, int(pk))
+    except (ValueError, TypeError, IndexError, OverflowError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or not 0 < position[1] <= MAX_PK:
+        return None
+    return direction, position
+
+
+def seek(queryset, position, backwards,
+         date_field='pub_date', pk_field='id'):
+    """Отбирает строки за позицией и упорядочивает их в порядке обхода.
+
+    Условие записано как `date <= d AND NOT (date = d AND pk >= p)`,
+    чтобы база искала позицию по индексу, а не фильтровала строки
+    от начала таблицы.
+    """
+    date, pk = date_field, pk_field
+    if position is not None:
+        if backwards:
+            queryset = queryset.filter(
+                **{f'{date}__gte': position[0]}).exclude(
+                    **{date: position[0], f'{pk}__lte': position[1]})
+        else:
+            queryset = queryset.filter(
+                **{f'{date}__lte': position[0]}).exclude(
+                    **{date: position[0], f'{pk}__gte': position[1]})
+    if backwards:
+        return queryset.order_by(date, pk)
+    return queryset.order_by(f'-{date}', f'-{pk}')
+
+
+def merge(streams, backwards, limit):
+    """Сливает отсортированные по (pub_date, id) потоки постов.
+
+    Каждый поток уже ограничен `limit` строками, поэтому слияние k потоков
+    стоит O(k * limit * log k) независимо от размера таблиц.
+    """
+    merged = heapq.merge(
+        *streams,
+        key=lambda post: (post.pub_date, post.pk),
+        reverse=not backwards)
+    return list(islice(merged, limit))
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (дата, id) без COUNT и OFFSET.
+
+    Каждая страница выбирается поиском по индексу от позиции из курсора,
+    поэтому любая страница стоит столько же, сколько первая. Общее число
+    страниц неизвестно: `count` и `num_pages` описывают только соседей
+    текущей страницы, чтобы методы `Page` работали без запроса COUNT.
+    """
+
+    def __init__(self, object_list, per_page,
+                 date_field='pub_date', pk_field='id'):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.count = 0
+        self.num_pages = 1
+
+    def position(self, obj):
+        return (getattr(obj, self.date_field), getattr(obj, self.pk_field))
+
+    def fetch(self, position, backwards, limit):
+        """Возвращает до `limit` объектов после позиции в порядке обхода."""
+        queryset = seek(
+            self.object_list, position, backwards,
+            self.date_field, self.pk_field)
+        return list(queryset[:limit])
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            direction, position = FORWARD, None
+        else:
+            direction, position = decoded
+        backwards = direction == BACKWARD
+
+        rows = self.fetch(position, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            if not has_more:
+                return self.get_page(None)
+            rows.reverse()
+            has_previous, has_next = True, True
+        else:
+            has_previous, has_next = position is not None, has_more
+        return self._make_page(rows, has_previous, has_next)
+
+    def page(self, number):
+        return self.get_page(number)
+
+    def _make_page(self, rows, has_previous, has_next):
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        self.count = len(rows)
+        page = Page(rows, number, self)
+        page.previous_cursor = None
+        page.next_cursor = None
+        if has_previous and rows:
+            page.previous_cursor = encode_cursor(
+                BACKWARD, self.position(rows[0]))
+        if has_next and rows:
+            page.next_cursor = encode_cursor(
+                FORWARD, self.position(rows[-1]))
+        return page
+
+
+class EstimatedCountPaginator(CursorPaginator):
+    """Нумерованные страницы по оценке числа строк вместо COUNT(*).
+
+    Число страниц берётся из `count` — счётчика или оценки, которая
+    может расходиться с таблицей. Страница N всегда выбирается по
+    смещению (N - 1) * per_page от начала, так что номера не повторяют
+    и не пропускают строк. Номер больше оценки сводится к первой
+    странице за её пределами. Если по номеру строк уже нет, настоящее
+    их число считается до этого смещения и открывается последняя
+    непустая страница. Страницы получают курсоры соседей, и «Следующая»
+    дальше идёт поиском по индексу, а не по смещению.
+    """
+
+    def __init__(self, object_list, per_page, count,
+                 date_field='pub_date', pk_field='id'):
+        super().__init__(object_list, per_page, date_field, pk_field)
+        self.estimated_count = count
+        self.estimated_pages = max(1, -(-count // per_page))
+
+    def get_numbered_page(self, number):
+        if number == LAST_PAGE:
+            number = self.estimated_pages
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(number, self.estimated_pages + 1)
+        ordered = seek(
+            self.object_list, None, False, self.date_field, self.pk_field)
+        bottom = (number - 1) * self.per_page
+        rows = list(ordered[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            # Оценка завышена: считаем строки не дальше уже пройденного.
+            number = max(1, -(-ordered[:bottom].count() // self.per_page))
+            bottom = (number - 1) * self.per_page
+            rows = list(ordered[bottom:bottom + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        page = self._make_page(rows[:self.per_page], number > 1, has_next)
+        page.number = number
+        self.num_pages = number
+        if has_next:
+            self.num_pages = max(number + 1, self.estimated_pages)
+        # Номера дальше первой страницы за оценкой не открываются,
+        # туда ведёт «Следующая» по курсору.
+        page.window = page_window(
+            number, min(self.num_pages, self.estimated_pages + 1))
+        return page
+
+
+def page_window(number, num_pages, size=2):
+    """Номера страниц вокруг текущей, первая и последняя; None — пропуск.
+
+    page_window(10, 40) == [1, None, 8, 9, 10, 11, 12, None, 40]
+    """
+    first = max(number - size, 1)
+    last = min(number + size, num_pages)
+    # Пропуск в одну страницу занимает столько же места, сколько её номер.
+    if first == 3:
+        first = 2
+    if last == num_pages - 2:
+        last = num_pages - 1
+    pages = list(range(first, last + 1))
+    if first > 1:
+        pages[:0] = [1, None] if first > 2 else [1]
+    if last < num_pages:
+        pages += [None, num_pages] if last < num_pages - 1 else [num_pages]
+    return pages
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорный вывод ленты подписок.
+
+    Посты авторов с рассылкой читаются одним проходом по индексу
+    (user, pub_date, post) таблицы FeedItem. Посты авторов из
+    `pulled_authors` берутся прямо из Post, по `limit` строк на автора,
+    и сливаются с лентой по дате публикации.
+    """
+
+    def __init__(self, object_list, per_page, pulled_authors=()):
+        self.pulled_authors = list(pulled_authors)
+        if self.pulled_authors:
+            object_list = object_list.exclude(
+                author__in=self.pulled_authors)
+        super().__init__(
+            object_list.select_related('post__author', 'post__group'),
+            per_page, pk_field='post_id')
+
+    def position(self, post):
+        return post.pub_date, post.pk
+
+    def fetch(self, position, backwards, limit):
+        inbox = [
+            item.post
+            for item in super().fetch(position, backwards, limit)]
+        if not self.pulled_authors:
+            return inbox
+        streams = [inbox]
+        for author_id in self.pulled_authors:
+            posts = Post.objects.filter(
+                author=author_id).select_related('author', 'group')
+            streams.append(seek(posts, position, backwards)[:limit])
+        return merge(streams, backwards, limit)
+
+
+def encode_rank_cursor(position):
+    rank, pk = position
+    return urlsafe_base64_encode(force_bytes(f'{rank!r}:{pk}'))
+
+
+def decode_rank_cursor(cursor):
+    try:
+        rank, pk = urlsafe_base64_decode(cursor).decode().split(':')
+        rank, pk = float(rank), int(pk)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if not math.isfinite(rank) or not 0 < pk <= MAX_PK:
+        return None
+    return rank, pk
+
+
+class SearchPaginator(Paginator):
+    """Курсорный вывод результатов поиска по убыванию релевантности.
+
+    Курсор хранит позицию (ранг, id) последнего результата, и следующая
+    страница выбирается из индекса сразу за ней. Как и у
+    `CursorPaginator`, общее число результатов не считается.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page)
+        self.expression = search.match_expression(query)
+        self.count = 0
+        self.num_pages = 1
+
+    def get_page(self, cursor):
+        position = decode_rank_cursor(cursor) if cursor else None
+        rows = []
+        if self.expression:
+            rows = search.matches(
+                self.expression, position, self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        # Пост мог быть удалён между запросами к индексу и к таблице.
+        results = [posts[pk] for pk, _ in rows if pk in posts]
+
+        number = 2 if position is not None else 1
+        self.num_pages = number + 1 if has_next else number
+        self.count = len(results)
+        page = Page(results, number, self)
+        page.previous_cursor = None
+        page.next_cursor = None
+        if has_next:
+            pk, rank = rows[-1]
+            page.next_cursor = encode_rank_cursor((rank, pk))
+        return page
+
+    def page(self, number):
+        return self.get_page(number)
+
+
+class ApproximateCountPaginator(Paginator):
+    """Нумерованные страницы без COUNT(*) по всей таблице.
+
+    Для выборки без фильтров число строк оценивается сверху по
+    наибольшему первичному ключу — это один шаг по индексу. Выборку
+    с фильтрами считают не дальше `limit` строк: номера страниц за этой
+    границей не показываются, но сами страницы открываются.
+    """
+
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return queryset.model._default_manager.aggregate(
+                top=Max('pk'))['top'] or 0
+        return queryset.order_by()[:self.limit].count()
+
+    @property
+    def capped(self):
+        """Упёрся ли подсчёт в `limit`: тогда строк может быть больше."""
+        return bool(self.object_list.query.where) and self.count >= self.limit
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.capped or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number <= self.num_pages:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = self.object_list[bottom:bottom + self.per_page]
+        if not rows:
+            raise EmptyPage('Страница не содержит результатов')
+        return self._get_page(rows, number, self)
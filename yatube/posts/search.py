@@ -0,0 +1,63 @@
+import re
+
+from django.db import connection
+
+TABLE = 'posts_post_fts'
+MAX_TERMS = 8
+WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Приводит «ё» к «е»: unicode61 не считает их одной буквой."""
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательской строки или '' без слов.
+
+    Каждое слово берётся в кавычки, так что синтаксис FTS5 из строки
+    не исполняется, и ищется по префиксу: «котик» найдёт и «котиками».
+    """
+    terms = WORD.findall(normalize(query))[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_post(post):
+    """Кладёт текст поста в индекс, заменяя прежний."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, normalize(post.text)])
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild(using=connection):
+    """Заполняет индекс заново из таблицы постов."""
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, text) SELECT id, "
+            f"replace(replace(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post")
+
+
+def matches(expression, position, limit):
+    """До `limit` пар (id поста, ранг) после позиции (ранг, id).
+
+    Ранг — bm25 от FTS5: чем меньше, тем релевантнее; при равном ранге
+    раньше идёт меньший id, так что порядок полный и курсор однозначен.
+    """
+    sql = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+    params = [expression]
+    if position is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [position[0], position[0], position[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    blobs, caching, counters, feed, follow_graph, images, search,
+    suggestions)
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def bump_post_listings(post, group_ids):
+    slugs = Group.objects.filter(
+        pk__in=[pk for pk in group_ids if pk]).values_list('slug', flat=True)
+    caching.bump_listings(caching.post_scopes(post, slugs))
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    instance._previous_group_id = instance._previous_image = None
+    if not instance._state.adding:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group', 'image').first() or (None, None))
+
+
+@receiver(pre_save, sender=Post)
+def store_image_metadata(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.fill_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_profile(instance.author_id, 'posts_count', 1)
+        feed.push_post(instance)
+    if instance.image.name != instance._previous_image:
+        blobs.acquire(instance.image.name)
+        blobs.release(instance._previous_image)
+    search.index_post(instance)
+    bump_post_listings(
+        instance, (instance.group_id, instance._previous_group_id))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_profile(instance.author_id, 'posts_count', -1)
+    blobs.release(instance.image.name)
+    search.unindex_post(instance.pk)
+    bump_post_listings(instance, (instance.group_id,))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post(instance.post_id, 'comments_count', 1)
+        bump_post_listings(instance.post, (instance.post.group_id,))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, 'comments_count', -1)
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        bump_post_listings(post, (post.group_id,))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump_listings((caching.GROUPS,))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_profile(instance.author_id, 'followers_count', 1)
+        counters.bump_profile(instance.user_id, 'following_count', 1)
+        feed.backfill(instance.user_id, instance.author_id)
+        follow_graph.graph.invalidate(instance.user_id)
+        suggestions.mark_changed(instance.user_id)
+        caching.bump_listings(
+            (caching.profile_scope(instance.author.username),))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_profile(instance.author_id, 'followers_count', -1)
+    counters.bump_profile(instance.user_id, 'following_count', -1)
+    feed.prune(instance.user_id, instance.author_id)
+    follow_graph.graph.invalidate(instance.user_id)
+    suggestions.mark_changed(instance.user_id)
+    caching.bump_listings(
+        (caching.profile_scope(instance.author.username),))
@@ -0,0 +1,43 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed(name):
+    """Имя выдано хранилищем по содержимому, а не задано вручную."""
+    return bool(name) and HASHED_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы по SHA-256 содержимого.
+
+    posts/cat.gif сохраняется как posts/ab/cd/abcd….gif в каталоге из
+    upload_to; одинаковые файлы записываются один раз и получают одно
+    имя, так что и миниатюры у них общие. Сколько постов ссылается
+    на файл, считает posts.blobs.
+    """
+
+    def _save(self, name, content):
+        digest = content_hash(content)
+        folder = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(
+            folder, digest[:2], digest[2:4], f'{digest}{extension}')
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,108 @@
+import heapq
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from . import follow_graph
+from .models import Follow, FollowChange, Suggestion
+
+
+def mark_changed(user_id):
+    """Отмечает, что подписки пользователя изменились с прошлого расчёта."""
+    FollowChange.objects.bulk_create(
+        (FollowChange(user_id=user_id),), ignore_conflicts=True)
+
+
+def take_changed():
+    """Забирает отметки об изменившихся подписках.
+
+    Отметки снимаются до расчёта: подписка, сделанная во время него,
+    оставит новую и попадёт в следующий запуск.
+    """
+    changed = list(FollowChange.objects.values_list('user', flat=True))
+    for batch in _batches(changed):
+        FollowChange.objects.filter(user__in=batch).delete()
+    return changed
+
+
+def _batches(ids):
+    ids = iter(ids)
+    batch = list(islice(ids, settings.FEED_BATCH_SIZE))
+    while batch:
+        yield batch
+        batch = list(islice(ids, settings.FEED_BATCH_SIZE))
+
+
+def adjacency(user_ids):
+    """Строки разреженной матрицы подписок: {id: [id авторов]}."""
+    rows = defaultdict(list)
+    for batch in _batches(user_ids):
+        pairs = Follow.objects.filter(user__in=batch).order_by(
+            'user', 'author').values_list('user', 'author')
+        for user_id, author_id in pairs.iterator():
+            rows[user_id].append(author_id)
+    return rows
+
+
+def score(user_id, rows, limit):
+    """Лучшие авторы второго круга: [(id автора, общих подписок)].
+
+    Это строка произведения A·A матрицы подписок на саму себя: вклад
+    каждой подписки пользователя — строка подписок того, на кого он
+    подписан. Уже отслеживаемые авторы и сам пользователь выбрасываются,
+    при равном счёте раньше идёт меньший id.
+    """
+    following = rows.get(user_id, ())
+    scores = Counter()
+    for followee in following:
+        scores.update(rows.get(followee, ()))
+    for author_id in (user_id, *following):
+        scores.pop(author_id, None)
+    return heapq.nsmallest(
+        limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def affected_users(changed):
+    """Те, чьи рекомендации зависят от подписок `changed`.
+
+    Второй круг пользователя меняется, когда меняются его собственные
+    подписки или подписки тех, на кого он подписан.
+    """
+    users = set(changed)
+    for batch in _batches(changed):
+        users.update(Follow.objects.filter(
+            author__in=batch).values_list('user', flat=True).iterator())
+    return users
+
+
+def recompute(user_ids):
+    """Пересчитывает и сохраняет рекомендации пользователей пачками."""
+    limit = settings.SUGGESTIONS_PER_USER
+    updated = 0
+    for batch in _batches(sorted(user_ids)):
+        rows = adjacency(batch)
+        followees = {
+            author_id for authors in rows.values() for author_id in authors}
+        rows.update(adjacency(followees - rows.keys()))
+        suggestions = [
+            Suggestion(user_id=user_id, author_id=author_id, score=count)
+            for user_id in batch
+            for author_id, count in score(user_id, rows, limit)]
+        with transaction.atomic():
+            Suggestion.objects.filter(user__in=batch).delete()
+            Suggestion.objects.bulk_create(suggestions)
+        updated += len(batch)
+    return updated
+
+
+def for_user(user):
+    """Сохранённые рекомендации без тех, на кого уже подписались."""
+    suggestions = list(Suggestion.objects.filter(
+        user=user).select_related('author'))
+    following = follow_graph.following_set(
+        user, [suggestion.author_id for suggestion in suggestions])
+    return [
+        suggestion for suggestion in suggestions
+        if suggestion.author_id not in following]
@@ -0,0 +1,44 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import caching, thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_desk.html'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Возвращает HTML карточек постов, беря готовые из кэша.
+
+    Ключи всей страницы читаются одним `get_many`, шаблон карточки
+    рендерится только для промахов. Карточки, чьи миниатюры ещё
+    строятся, не кэшируются, чтобы не застрять с исходной картинкой.
+    """
+    flags = {
+        'HIDE_AUTHOR_INFO': context.get('HIDE_AUTHOR_INFO', False),
+        'HIDE_GROUP_INFO': context.get('HIDE_GROUP_INFO', False),
+    }
+    variant = ''.join(str(int(bool(flag))) for flag in flags.values())
+    groups_version = caching.listing_versions((caching.GROUPS,))
+    keys = [caching.card_key(post, variant, groups_version) for post in posts]
+    cards = cache.get_many(keys)
+
+    missing = {}
+    pending = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            card = render_to_string(CARD_TEMPLATE, {'post': post, **flags})
+            if post.image and not thumbnails.ready(post):
+                pending[key] = card
+            else:
+                missing[key] = card
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    cards.update(missing)
+    cards.update(pending)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,34 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, sizes):
+    """Картинка поста с srcset по готовым вариантам.
+
+    Пока варианты не построены, выводится исходный файл. Картинки при
+    этом не читаются: адреса берутся из хранилища миниатюр.
+    """
+    srcsets = {True: [], False: []}
+    src = None
+    for name, width, webp in thumbnails.variants():
+        variant = thumbnails.get(post, name)
+        if variant is None:
+            continue
+        srcsets[webp].append(f'{variant.url} {width}w')
+        if not webp:
+            src = variant.url
+    width, height = settings.POST_IMAGE_SIZE
+    return {
+        'post': post,
+        'src': src,
+        'srcset': ', '.join(srcsets[False]),
+        'webp_srcset': ', '.join(srcsets[True]),
+        'sizes': sizes,
+        'width': width,
+        'height': height,
+    }
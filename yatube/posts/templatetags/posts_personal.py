@@ -0,0 +1,20 @@
+from django import template
+
+from posts import follow_graph
+from posts.forms import CommentForm
+
+register = template.Library()
+
+
+@register.filter
+def followed_by(author, user):
+    """Подписан ли пользователь на автора."""
+    if not user.is_authenticated:
+        return False
+    return follow_graph.is_following(user, author)
+
+
+@register.simple_tag
+def comment_form():
+    """Пустая форма комментария для фрагмента, который не кэшируется."""
+    return CommentForm()
@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.admin import PostAdmin
+from posts.models import Group, Post, User
+from posts.paginators import ApproximateCountPaginator
+
+CHANGELIST = reverse('admin:posts_post_changelist')
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_posts(self, start, stop):
+        for number in range(start, stop):
+            author = User.objects.create_user(username=f'user{number}')
+            group = Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Описание')
+            Post.objects.create(author=author, group=group, text='пост')
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CHANGELIST, params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк и групп"""
+        self.add_posts(0, 2)
+        few = len(self.changelist_queries())
+        self.add_posts(2, 10)
+        self.assertEqual(len(self.changelist_queries()), few)
+
+    def test_no_full_table_count(self):
+        """Список не считает все строки таблицы постов"""
+        self.add_posts(0, 3)
+        for params in ({}, {'group__id__exact': self.group.pk}):
+            with self.subTest(params=params):
+                for sql in self.changelist_queries(**params):
+                    if 'COUNT(' in sql:
+                        self.assertIn('LIMIT', sql)
+
+    @mock.patch.object(ApproximateCountPaginator, 'limit', 3)
+    @mock.patch.object(PostAdmin, 'list_per_page', 2)
+    def test_pages_past_count_limit(self):
+        """Страницы за границей подсчёта открываются"""
+        posts = [
+            Post.objects.create(
+                author=self.admin, group=self.group, text=str(number))
+            for number in range(8)]
+        params = {'group__id__exact': self.group.pk, 'p': 3}
+        response = self.client.get(CHANGELIST, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context['cl'].result_list), posts[1::-1])
+        params['p'] = 4
+        response = self.client.get(CHANGELIST, params)
+        self.assertRedirects(
+            response, f'{CHANGELIST}?e=1', fetch_redirect_response=False)
+
+    def test_search_uses_index(self):
+        """Поиск в админке идёт через индекс, а не LIKE"""
+        post = Post.objects.create(
+            author=self.admin, text='Уникальный котик')
+        Post.objects.create(author=self.admin, text='Собака')
+        response = self.client.get(CHANGELIST, {'q': 'котик'})
+        self.assertEqual(list(response.context['cl'].result_list), [post])
+        sql = ' '.join(self.changelist_queries(q='котик'))
+        self.assertIn('posts_post_fts', sql)
+        self.assertNotIn('LIKE', sql)
+
+    def test_group_search(self):
+        """Поиск групп работает по названию и адресу"""
+        response = self.client.get(
+            reverse('admin:posts_group_changelist'), {'q': 'group'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.group])
@@ -0,0 +1,207 @@
+import multiprocessing
+import sys
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase
+
+from core.cache import LocalTier, TieredCache
+from posts.caching import single_flight
+
+
+def process_cache(name):
+    """Экземпляр кэша с отдельным LRU, как в другом процессе."""
+    return TieredCache(name, settings.CACHES['default'])
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Двухуровневый кэш: LRU процесса поверх общего кэша."""
+
+    def setUp(self):
+        cache.clear()
+        self.first = process_cache('first')
+        self.second = process_cache('second')
+
+    def test_local_tier_serves_repeated_reads(self):
+        """Повторное чтение не доходит до общего кэша"""
+        self.first.set('key', {'value': 1})
+        self.second.get('key')
+        before = self.second.stats()
+        value = self.second.get('key')
+        after = self.second.stats()
+        self.assertEqual(value, {'value': 1})
+        self.assertEqual(after['local_hits'], before['local_hits'] + 1)
+        self.assertEqual(after['shared_hits'], before['shared_hits'])
+
+    def test_local_copies_are_independent(self):
+        """Изменение полученного объекта не портит закэшированный"""
+        self.first.set('key', ['value'])
+        self.first.get('key').append('changed')
+        self.assertEqual(self.first.get('key'), ['value'])
+
+    def test_overwrite_reaches_other_processes(self):
+        """После перезаписи другой процесс видит новое значение"""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.second.close()
+        self.assertEqual(self.second.get('key'), 'new')
+
+    def test_delete_reaches_other_processes(self):
+        """После удаления другой процесс не отдаёт значение из LRU"""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.first.delete('key')
+        self.second.close()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_rewrite_after_eviction_reaches_other_processes(self):
+        """Запись ключа, вытесненного из общего кэша, сбрасывает чужие
+        копии"""
+        self.first.set('key', 'old', None)
+        self.assertEqual(self.second.get('key'), 'old')
+        caches[settings.CACHES['default']['OPTIONS']['SHARED']].delete('key')
+        self.first.set('key', 'new', None)
+        self.second.close()
+        self.assertEqual(self.second.get('key'), 'new')
+
+    def test_local_copy_expires_with_shared_entry(self):
+        """Копия в LRU не живёт дольше записи в общем кэше"""
+        self.first.set('key', 'value', 10)
+        self.assertEqual(self.second.get('key'), 'value')
+        with mock.patch('time.time', return_value=time.time() + 60):
+            self.assertIsNone(self.second.get('key'))
+
+    def test_get_many_counts_both_tiers(self):
+        """get_many берёт из общего кэша только промахи LRU"""
+        self.first.set_many({'a': 1, 'b': 2})
+        self.second.get('a')
+        before = self.second.stats()
+        found = self.second.get_many(['a', 'b', 'c'])
+        after = self.second.stats()
+        self.assertEqual(found, {'a': 1, 'b': 2})
+        self.assertEqual(after['local_hits'] - before['local_hits'], 1)
+        self.assertEqual(after['shared_hits'] - before['shared_hits'], 1)
+        self.assertEqual(after['shared_misses'] - before['shared_misses'], 1)
+
+    def test_local_tier_evicts_least_recently_used(self):
+        """LRU вытесняет давно не читанные записи при переполнении"""
+        tier = LocalTier(max_entries=2, max_bytes=1024 * 16)
+        tier.set('a', b'1', None)
+        tier.set('b', b'2', None)
+        tier.get('a')
+        tier.set('c', b'3', None)
+        self.assertEqual(tier.get('a'), b'1')
+        self.assertIsNone(tier.get('b'))
+
+    def test_local_tier_is_bounded_by_size(self):
+        """LRU не держит больше байт, чем разрешено"""
+        tier = LocalTier(max_entries=100, max_bytes=16 * 10)
+        for number in range(20):
+            tier.set(number, b'x' * 10, None)
+        self.assertLessEqual(tier.size, 16 * 10)
+        tier.set('big', b'x' * 11, None)
+        self.assertIsNone(tier.get('big'))
+
+
+class SingleFlightTest(SimpleTestCase):
+    """Перестройка ключа под нагрузкой идёт в одном месте."""
+
+    THREADS = 16
+
+    def setUp(self):
+        cache.clear()
+        self.builds = []
+        self.release = threading.Event()
+
+    def build(self, value):
+        def build():
+            self.builds.append(value)
+            self.release.wait(5)
+            return value, True
+        return build
+
+    def run_threads(self, key, value, stale_key=None):
+        results = []
+        start = threading.Barrier(self.THREADS)
+
+        def worker():
+            start.wait()
+            results.append(single_flight(
+                key, self.build(value), 60, stale_key))
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def finish(self, threads):
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+    def test_one_build_per_key(self):
+        """Одновременные промахи перестраивают ключ ровно один раз"""
+        for key in ('first', 'second'):
+            self.builds.clear()
+            self.release.clear()
+            threads, results = self.run_threads(key, key)
+            time.sleep(0.2)
+            self.finish(threads)
+            self.assertEqual(self.builds, [key])
+            self.assertEqual(results, [key] * self.THREADS)
+
+    def test_one_build_across_processes(self):
+        """Ключ перестраивает один процесс, даже если их несколько"""
+        context = multiprocessing.get_context('fork')
+        builds = context.Value('i', 0)
+        start = context.Barrier(self.THREADS)
+
+        def build():
+            with builds.get_lock():
+                builds.value += 1
+            time.sleep(0.5)
+            return 'value', True
+
+        def worker():
+            start.wait()
+            if single_flight('key', build, 60) != 'value':
+                sys.exit(1)
+
+        processes = [context.Process(target=worker)
+                     for _ in range(self.THREADS)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(10)
+        self.assertEqual(
+            [process.exitcode for process in processes], [0] * self.THREADS)
+        self.assertEqual(builds.value, 1)
+
+    def test_stale_value_while_rebuilding(self):
+        """Пока ключ перестраивается, остальные сразу получают прежнее"""
+        single_flight('key', lambda: ('old', True), 60, 'path')
+        threads, results = self.run_threads('new-key', 'new', 'path')
+        deadline = time.monotonic() + 5
+        while len(results) < self.THREADS - 1:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.finish(threads)
+        self.assertEqual(self.builds, ['new'])
+        self.assertEqual(
+            sorted(results), ['new'] + ['old'] * (self.THREADS - 1))
+
+    def test_early_refresh(self):
+        """Запись обновляется заранее, пока она ещё не истекла"""
+        cache.set('key', (time.time() + 60, 10, 'old'), 60)
+        with mock.patch('posts.caching.random.random', return_value=0):
+            value = single_flight('key', lambda: ('new', True), 60)
+        self.assertEqual(value, 'old')
+        with mock.patch('posts.caching.random.random',
+                        return_value=1 - 10 ** -6):
+            value = single_flight('key', lambda: ('new', True), 60)
+        self.assertEqual(value, 'new')
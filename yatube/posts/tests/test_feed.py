@@ -0,0 +1,108 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import FeedItem, Follow, Post, PulledAuthor, User
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_posts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return response.context['page_obj'].object_list
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту старые посты автора"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        self.assertEqual(self.feed_posts(), [self.old_post])
+
+    def test_new_post_pushed_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.feed_posts(), [new_post, self.old_post])
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.author).exists())
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,)))
+        self.assertEqual(self.feed_posts(), [])
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает потерянные записи"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_posts(), [self.old_post])
+
+    def test_migration_fills_feeds(self):
+        """Миграция раскладывает существующие посты по лентам"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        migration = import_module('posts.migrations.0008_feeditem')
+        migration.fill_feeds(apps, None)
+        self.assertEqual(self.feed_posts(), [self.old_post])
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.author).exists())
+
+
+@override_settings(FEED_PUSH_THRESHOLD=1, OBJ_ON_PAGES=3)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        Follow.objects.create(user=fan, author=cls.celebrity)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(author=author, text=str(number))
+            for number, author in enumerate(
+                (cls.author, cls.celebrity) * 3)]
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_celebrity_posts_are_pulled(self):
+        """Посты автора с множеством подписчиков не рассылаются"""
+        self.assertTrue(
+            PulledAuthor.objects.filter(author=self.celebrity).exists())
+        self.assertFalse(
+            FeedItem.objects.filter(author=self.celebrity).exists())
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 3)
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента сливает оба источника по дате публикации"""
+        url = reverse('posts:follow_index')
+        first_page = self.reader_client.get(url).context['page_obj']
+        second_page = self.reader_client.get(
+            url + f'?cursor={first_page.next_cursor}').context['page_obj']
+        self.assertEqual(
+            first_page.object_list + second_page.object_list,
+            self.posts[::-1])
+        self.assertFalse(second_page.has_next())
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import follow_graph
+from posts.follow_graph import FollowGraph
+from posts.models import Follow, User
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)]
+        for author in cls.authors[::2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.graph.clear()
+
+    def test_lookups_without_queries(self):
+        """После первого чтения проверки подписок не ходят в базу"""
+        follow_graph.is_following(self.reader, self.authors[0])
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.reader, self.authors[2]))
+            self.assertFalse(
+                follow_graph.is_following(self.reader, self.authors[1]))
+            self.assertEqual(
+                follow_graph.following_set(self.reader, self.authors),
+                {author.pk for author in self.authors[::2]})
+
+    def test_signals_keep_index_in_sync(self):
+        """Подписка и отписка сразу видны в индексе"""
+        author = self.authors[1]
+        self.assertFalse(follow_graph.is_following(self.reader, author))
+        follow = Follow.objects.create(user=self.reader, author=author)
+        self.assertTrue(follow_graph.is_following(self.reader, author))
+        follow.delete()
+        self.assertFalse(follow_graph.is_following(self.reader, author))
+
+    def test_other_processes_reload(self):
+        """Индекс другого процесса перечитывает изменившиеся подписки"""
+        other = FollowGraph(max_users=10)
+        author = self.authors[3]
+        self.assertNotIn(author.pk, other.following(self.reader.pk))
+        with mock.patch('posts.follow_graph.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertIn(author.pk, other.following(self.reader.pk))
+
+    def test_anonymous_follows_nobody(self):
+        """Аноним ни на кого не подписан"""
+        anonymous = AnonymousUser()
+        with self.assertNumQueries(0):
+            self.assertFalse(
+                follow_graph.is_following(anonymous, self.authors[0]))
+            self.assertEqual(
+                follow_graph.following_set(anonymous, self.authors), set())
+
+    def test_bounded_and_measured(self):
+        """Индекс держит не больше max_users и сообщает свой размер"""
+        graph = FollowGraph(max_users=1)
+        graph.following(self.authors[0].pk)
+        graph.following(self.reader.pk)
+        stats = graph.stats()
+        self.assertEqual(stats['users'], 1)
+        self.assertEqual(stats['edges'], 3)
+        self.assertEqual(stats['loads'], 2)
+        self.assertGreater(stats['bytes'], 0)
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -7,9 +8,13 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.conf import settings
 
+from PIL import Image
+
+from posts.forms import PostForm
 from posts.models import Post, Group, User, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+HASHED_GIF = r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -78,7 +83,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(text=text,
                                 group=group_test,
                                 author=self.post.author,
-                                image='posts/create_post.gif',
+                                image__regex=HASHED_GIF,
                                 ).exists())
 
     def test_edit_post(self):
@@ -103,7 +108,7 @@ class PostFormTests(TestCase):
                                             group=data_group,
                                             pub_date=self.post.pub_date,
                                             author=self.post.author,
-                                            image='posts/edit_post.gif',
+                                            image__regex=HASHED_GIF,
                                             ).exists())
 
     def test_post_edit_client(self):
@@ -164,3 +169,50 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.count(), comment_count + 1)
         self.assertRedirects(response, reverse(
             'posts:post_detail', args=(self.post.pk,)))
+
+
+class ImageUploadTests(TestCase):
+    @staticmethod
+    def upload(image_format='JPEG', size=(20, 10), **options):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 0, 0)).save(
+            buffer, image_format, **options)
+        return SimpleUploadedFile(
+            f'upload.{image_format.lower()}', buffer.getvalue(),
+            content_type=Image.MIME[image_format])
+
+    def form(self, upload):
+        return PostForm({'text': 'Текст'}, {'image': upload})
+
+    def test_exif_stripped(self):
+        """EXIF удаляется, поворот из него применяется к картинке"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        form = self.form(self.upload(exif=exif.tobytes()))
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertEqual(image.size, (10, 20))
+
+    def test_extension_from_format(self):
+        """Расширение файла соответствует формату, а не имени загрузки"""
+        upload = self.upload('PNG')
+        upload.name = 'upload.jpg'
+        form = self.form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['image'].name, 'upload.png')
+
+    def test_rejected_uploads(self):
+        """Неподходящие картинки отклоняются с ошибкой в форме"""
+        cases = (
+            ({'POST_IMAGE_MAX_PIXELS': 100}, self.upload(), 'Мп'),
+            ({'POST_IMAGE_MAX_BYTES': 10}, self.upload(), 'МБ'),
+            ({}, self.upload('BMP'), 'BMP'),
+        )
+        for overrides, upload, message in cases:
+            with self.subTest(message=message), \
+                    override_settings(**overrides):
+                form = self.form(upload)
+                self.assertFalse(form.is_valid())
+                self.assertIn(message, form.errors['image'][0])
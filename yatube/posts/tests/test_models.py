@@ -1,6 +1,13 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-from ..models import Group, Post, User, Comment
+from ..models import Group, Post, User, Comment, Follow, Profile
 
 
 class PostModelTest(TestCase):
@@ -66,3 +73,81 @@ class CommentModelTest(TestCase):
         verbose_name_plural = comment._meta.verbose_name_plural
         self.assertEquals(verbose_name, 'Комментарий')
         self.assertEquals(verbose_name_plural, 'Комментарии')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def counters(self, user):
+        profile = Profile.objects.get(user=user)
+        return (
+            profile.posts_count,
+            profile.followers_count,
+            profile.following_count)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками"""
+        Post.objects.create(author=self.author, text='Второй пост')
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.counters(self.author), (2, 1, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 1))
+
+        follow.delete()
+        self.post.comments.all().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.counters(self.author), (2, 0, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0))
+
+    def test_recount_counters_command(self):
+        """Команда recount_counters исправляет расхождения"""
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.filter(user=self.reader).delete()
+        Profile.objects.update(posts_count=100, followers_count=100)
+        Post.objects.update(comments_count=100)
+
+        call_command('recount_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.counters(self.author), (1, 1, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 1))
+
+    def test_recount_migration(self):
+        """Миграция счётчиков заводит профили и считает по данным"""
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.filter(user=self.reader).delete()
+        Profile.objects.update(posts_count=100, followers_count=100)
+        Post.objects.update(comments_count=100)
+
+        migration = import_module('posts.migrations.0011_recount_counters')
+        migration.recount(apps, None)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.counters(self.author), (1, 1, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 1))
+
+    def test_profile_page_without_profile(self):
+        """Страница автора без профиля открывается и заводит профиль"""
+        Profile.objects.filter(user=self.author).delete()
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertEqual(self.counters(self.author), (1, 0, 0))
+
+    def test_user_delete(self):
+        """Удаление пользователя не ломает обработчики сигналов"""
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author.delete()
+        self.assertEqual(self.counters(self.reader), (0, 0, 0))
@@ -0,0 +1,71 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTest(TestCase):
+    """Запросы страниц должны идти по индексам без сортировки в памяти."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(15):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=str(number))
+            Comment.objects.create(
+                post=post, author=cls.reader, text=str(number))
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_plans_use_indexes(self, url):
+        first_page = self.client.get(url)
+        next_url = url
+        if first_page.context and 'page_obj' in first_page.context:
+            next_cursor = first_page.context['page_obj'].next_cursor
+            next_url = f'{url}?cursor={next_cursor}'
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(next_url)
+        for query in captured:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in query_plan(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotRegex(step, FULL_SCAN)
+                    self.assertNotIn(TEMP_SORT, step)
+
+    def test_view_query_plans(self):
+        """Ни один запрос страниц не сканирует таблицу целиком"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            self.assert_plans_use_indexes(url)
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from posts.models import Post, User
+
+
+@override_settings(OBJ_ON_PAGES=2)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.cat = Post.objects.create(author=cls.user, text='Котик спит')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Котик и ещё котик, котики повсюду')
+        cls.hedgehog = Post.objects.create(
+            author=cls.user, text='Ёжик в тумане')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, query, cursor=None):
+        params = {'q': query}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_ranked_by_relevance(self):
+        """Чаще упоминающий слово пост выше, слова ищутся по префиксу"""
+        self.assertEqual(
+            list(self.search('котик')), [self.cats, self.cat])
+        self.assertEqual(list(self.search('ежик')), [self.hedgehog])
+        self.assertEqual(list(self.search('котик спит')), [self.cat])
+
+    def test_index_follows_posts(self):
+        """Правка и удаление поста сразу видны в поиске"""
+        self.hedgehog.text = 'Котик в тумане'
+        self.hedgehog.save()
+        self.assertEqual(list(self.search('ежик')), [])
+        self.assertIn(self.hedgehog, self.search('туман'))
+        Post.objects.get(pk=self.cat.pk).delete()
+        self.assertEqual(list(self.search('спит')), [])
+
+    def test_cursor_pagination(self):
+        """Результаты листаются курсором без повторов и пропусков"""
+        extra = [
+            Post.objects.create(author=self.user, text=f'котик номер {n}')
+            for n in range(3)]
+        page = self.search('котик')
+        found = list(page)
+        while page.has_next():
+            page = self.search('котик', page.next_cursor)
+            found.extend(page)
+        self.assertEqual(
+            sorted(post.pk for post in found),
+            sorted(post.pk for post in (self.cat, self.cats, *extra)))
+        self.assertEqual(found[0], self.cats)
+
+    def test_broken_cursor(self):
+        """Курсор с нечисловым рангом или чужим id открывает начало"""
+        for position in ('nan:1', 'inf:1', '-inf:1', '1e999:1',
+                         f'-1.0:{2 ** 63}', '-1.0:0', 'котик:1', '1'):
+            with self.subTest(position=position):
+                cursor = urlsafe_base64_encode(force_bytes(position))
+                self.assertEqual(
+                    list(self.search('котик', cursor)), [self.cats, self.cat])
+
+    def test_query_syntax_is_not_executed(self):
+        """Операторы FTS5 в строке поиска не ломают запрос"""
+        for query in ('"котик', 'котик OR NOT', 'NEAR(котик', '*', '-:^'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
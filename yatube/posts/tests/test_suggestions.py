@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Follow, FollowChange, Suggestion, User
+
+
+@override_settings(SUGGESTIONS_PER_USER=2)
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'other', 'star', 'rising',
+                         'niche', 'stranger')}
+        cls.follows = (
+            ('reader', 'friend'), ('reader', 'other'),
+            ('friend', 'star'), ('other', 'star'),
+            ('friend', 'rising'), ('other', 'niche'),
+            ('friend', 'reader'), ('stranger', 'friend'),
+        )
+
+    def setUp(self):
+        for user, author in self.follows:
+            Follow.objects.create(
+                user=self.users[user], author=self.users[author])
+
+    def update(self, *args):
+        call_command('update_suggestions', *args, stdout=StringIO())
+
+    def suggested(self, name):
+        return list(Suggestion.objects.filter(
+            user=self.users[name]).values_list('author__username', 'score'))
+
+    def test_second_degree_ranked(self):
+        """Рекомендуются авторы второго круга по числу общих подписок"""
+        self.update()
+        self.assertEqual(
+            self.suggested('reader'), [('star', 2), ('rising', 1)])
+        self.assertEqual(
+            self.suggested('stranger'), [('reader', 1), ('star', 1)])
+
+    def test_incremental_update(self):
+        """Команда пересчитывает только тех, чей второй круг изменился"""
+        self.update()
+        self.assertFalse(FollowChange.objects.exists())
+        Suggestion.objects.filter(user=self.users['stranger']).update(score=99)
+        Follow.objects.create(
+            user=self.users['other'], author=self.users['rising'])
+        self.update()
+        self.assertEqual(
+            self.suggested('reader'), [('star', 2), ('rising', 2)])
+        self.assertEqual(
+            self.suggested('stranger'), [('reader', 99), ('star', 99)])
+
+    def test_full_update(self):
+        """С --all пересчитываются все, даже без отметок об изменениях"""
+        self.update()
+        Suggestion.objects.update(score=99)
+        self.update('--all')
+        self.assertEqual(
+            self.suggested('reader'), [('star', 2), ('rising', 1)])
+
+    def test_sidebar(self):
+        """Лента показывает сохранённые рекомендации без новых подписок"""
+        self.update()
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['star'])
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item.author for item in response.context['suggestions']],
+            [self.users['rising']])
+        self.assertContains(
+            response, reverse('posts:profile_follow', args=('rising',)))
+
+    def test_scores_are_a_sparse_product(self):
+        """Счёт — строка произведения матрицы подписок на себя"""
+        rows = {1: [2, 3], 2: [4, 5, 1], 3: [4]}
+        self.assertEqual(
+            suggestions.score(1, rows, 10), [(4, 2), (5, 1)])
@@ -0,0 +1,284 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image, features
+
+from posts import thumbnails
+from posts.models import ImageBlob, Post, User
+from posts.storage import is_hashed
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', image=uploaded())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_generate(self):
+        """Миниатюра появляется в хранилище после построения"""
+        thumbnails.generate(self.post.pk)
+        thumbnail = thumbnails.lookup(self.post.image, 'original-960')
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(thumbnail.exists())
+
+    def test_variants_next_to_original(self):
+        """Варианты лежат рядом с исходной картинкой"""
+        thumbnails.generate(self.post.pk)
+        folder = os.path.dirname(self.post.image.name)
+        for name, width, _ in thumbnails.variants():
+            with self.subTest(variant=name):
+                variant = thumbnails.lookup(self.post.image, name)
+                self.assertEqual(os.path.dirname(variant.name), folder)
+                with Image.open(variant.storage.path(variant.name)) as image:
+                    self.assertEqual(image.width, width)
+                    self.assertEqual(image.format, 'GIF')
+
+    @skipUnless(features.check('webp'), 'Pillow собран без WebP')
+    def test_webp_variants(self):
+        """Для каждой ширины строится и вариант в WebP"""
+        thumbnails.generate(self.post.pk)
+        webp = [name for name, _, is_webp in thumbnails.variants() if is_webp]
+        self.assertEqual(len(webp), len(settings.POST_IMAGE_WIDTHS))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_srcset(self):
+        """Карточка перечисляет все ширины и задаёт размеры картинки"""
+        thumbnails.generate(self.post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f' {width}w')
+        width, height = settings.POST_IMAGE_SIZE
+        self.assertContains(response, f'width="{width}" height="{height}"')
+
+    def test_pages_never_decode_images(self):
+        """Страницы берут готовые адреса и не открывают картинки"""
+        thumbnails.generate(self.post.pk)
+        url = thumbnails.lookup(self.post.image, 'original-960').url
+        with mock.patch('sorl.thumbnail.default.engine.get_image') as decode:
+            for page in (reverse('posts:index'),
+                         reverse('posts:post_detail', args=(self.post.pk,))):
+                with self.subTest(page=page):
+                    self.assertContains(self.client.get(page), url)
+            decode.assert_not_called()
+
+    def test_original_until_ready(self):
+        """Пока миниатюры нет, показывается исходная картинка"""
+        post = Post.objects.create(
+            author=self.user, text='Новый', image=uploaded('new.gif'))
+        with mock.patch('sorl.thumbnail.default.engine.get_image') as decode:
+            response = self.client.get(reverse('posts:index'))
+            decode.assert_not_called()
+        self.assertContains(response, post.image.url)
+        thumbnails.generate(post.pk)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, thumbnails.lookup(post.image, 'original-960').url)
+
+    def test_views_enqueue_generation(self):
+        """Создание и правка поста с картинкой ставят миниатюры в очередь"""
+        with mock.patch('posts.thumbnails.enqueue') as enqueue:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': uploaded('create.gif')})
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                data={'text': 'Правка', 'image': uploaded('edit.gif')})
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                data={'text': 'Без новой картинки'})
+        self.assertEqual(enqueue.call_count, 2)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_enqueue_inline(self):
+        """Без пула потоков миниатюры строятся сразу после коммита"""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.thumbnails._get_executor') as executor:
+            thumbnails.enqueue(self.post)
+        executor.assert_not_called()
+        self.assertTrue(thumbnails.ready(self.post))
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_enqueue_to_pool(self):
+        """С пулом потоков построение уходит в пул"""
+        with mock.patch('posts.thumbnails.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.thumbnails._get_executor') as executor:
+            thumbnails.enqueue(self.post)
+        executor.return_value.submit.assert_called_once_with(
+            thumbnails._run, self.post.pk)
+
+    def test_page_lookups_are_batched(self):
+        """Миниатюры страницы ищутся одним запросом к хранилищу sorl"""
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.user, text=str(number),
+                image=uploaded(f'{number}.gif'))
+            thumbnails.generate(post.pk)
+        thumbnails.generate(self.post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in response.context['page_obj']:
+            with self.subTest(post=post.pk):
+                self.assertContains(
+                    response, post.prefetched_thumbnails['original-960'].url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def assert_metadata(self, post):
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_size, len(SMALL_GIF))
+        self.assertEqual(post.image_mime, 'image/gif')
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(SMALL_GIF).hexdigest())
+
+    def test_metadata_saved_on_upload(self):
+        """Метаданные картинки сохраняются при загрузке"""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=uploaded())
+        self.assert_metadata(post)
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_hash, '')
+        self.assertIsNone(post.image_width)
+
+    def test_backfill(self):
+        """Команда дописывает метаданные старым постам"""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=uploaded())
+        missing = Post.objects.create(
+            author=self.user, text='Без файла', image='posts/missing.gif')
+        Post.objects.update(
+            image_width=None, image_height=None, image_size=None,
+            image_mime='', image_hash='')
+        err = StringIO()
+        call_command(
+            'backfill_image_metadata', batch_size=1,
+            stdout=StringIO(), stderr=err)
+        self.assert_metadata(post)
+        self.assertIn(missing.image.name, err.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_duplicates_share_one_file(self):
+        """Одинаковые картинки хранятся одним файлом с общими миниатюрами"""
+        first = Post.objects.create(
+            author=self.user, text='Первый', image=uploaded('first.gif'))
+        second = Post.objects.create(
+            author=self.user, text='Второй', image=uploaded('second.gif'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).refs, 2)
+        originals = [
+            name for name in os.listdir(os.path.dirname(first.image.path))
+            if '_' not in name]
+        self.assertEqual(originals, [os.path.basename(first.image.name)])
+        thumbnails.generate(first.pk)
+        self.assertTrue(thumbnails.ready(second))
+
+    def test_shared_file_built_once(self):
+        """Миниатюры общего файла строятся один раз и без лишних копий"""
+        first = Post.objects.create(
+            author=self.user, text='Первый', image=uploaded('first.gif'))
+        second = Post.objects.create(
+            author=self.user, text='Второй', image=uploaded('second.gif'))
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        wraps=thumbnails.get_thumbnail) as build:
+            thumbnails.generate(first.pk)
+            thumbnails.generate(second.pk)
+        self.assertEqual(build.call_count, len(thumbnails.variants()))
+        folder = os.path.dirname(first.image.path)
+        self.assertEqual(
+            len(os.listdir(folder)), len(thumbnails.variants()) + 1)
+
+    def test_unreferenced_file_removed(self):
+        """Файл удаляется вместе с последним ссылающимся постом"""
+        first = Post.objects.create(
+            author=self.user, text='Первый', image=uploaded('first.gif'))
+        second = Post.objects.create(
+            author=self.user, text='Второй', image=uploaded('second.gif'))
+        thumbnails.generate(first.pk)
+        variant = thumbnails.lookup(first.image, 'original-960')
+        with mock.patch('posts.blobs.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            first.delete()
+            self.assertTrue(first.image.storage.exists(first.image.name))
+            second.delete()
+        self.assertFalse(first.image.storage.exists(first.image.name))
+        self.assertFalse(variant.exists())
+        self.assertFalse(ImageBlob.objects.exists())
@@ -47,6 +47,7 @@ class PostModelTest(TestCase):
             '/group/slug_test/': HTTPStatus.OK,
             '/profile/auth/': HTTPStatus.OK,
             '/posts/1/': HTTPStatus.OK,
+            '/search/?q=пост': HTTPStatus.OK,
             '/zdrgzdfhxfghstgh/': HTTPStatus.NOT_FOUND,
             'posts/<int:post_id>/comment/': HTTPStatus.NOT_FOUND
         }
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
@@ -7,8 +8,16 @@ from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 
+from posts import estimates
 from posts.models import Group, Post, User, Follow
+from posts.paginators import (
+    BACKWARD, FORWARD, encode_cursor, page_window)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -244,9 +253,405 @@ class PaginatorViewTest(TestCase):
             with self.subTest(url_name=url_name, data=data):
                 response_1 = self.client.get(
                     reverse(url_name, kwargs=data))
+            next_cursor = response_1.context['page_obj'].next_cursor
             response_2 = self.client.get(
-                reverse(url_name, kwargs=data) + '?page=2')
+                reverse(url_name, kwargs=data) + f'?cursor={next_cursor}')
             self.assertEqual(
                 len(response_1.context['page_obj']), HOW_MANU_POSTS_ON_1)
             self.assertEqual(
                 len(response_2.context['page_obj']), HOW_MANU_POSTS_ON_2)
+
+    def test_cursor_pages(self):
+        """Тестируем переходы по курсорам вперёд и назад"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        first_page = self.client.get(url).context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        second_page = self.client.get(
+            url + f'?cursor={first_page.next_cursor}').context['page_obj']
+        self.assertTrue(second_page.has_previous())
+        self.assertFalse(second_page.has_next())
+        self.assertNotIn(second_page[0], first_page.object_list)
+
+        previous_page = self.client.get(
+            url + f'?cursor={second_page.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(previous_page.object_list, first_page.object_list)
+
+    def test_broken_cursor(self):
+        """Битый курсор открывает первую страницу"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        response = self.client.get(url + '?cursor=broken')
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            list(Post.objects.order_by('-pub_date', '-id')[:10]))
+
+    def test_out_of_range_cursor(self):
+        """Курсор с id или датой вне допустимых границ открывает первую
+        страницу"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        cursors = (
+            encode_cursor(FORWARD, (timezone.now(), 2 ** 63)),
+            encode_cursor(BACKWARD, (timezone.now(), -1)),
+            urlsafe_base64_encode(force_bytes(f'n{10 ** 20}.1')),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(
+                    response.context['page_obj'].object_list,
+                    list(Post.objects.order_by('-pub_date', '-id')[:10]))
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for number in range(25):
+            Post.objects.create(text=f'{number}', author=cls.user)
+        cls.oldest = Post.objects.order_by('pub_date', 'id').first()
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, url, **params):
+        return self.client.get(url, params).context['page_obj']
+
+    def test_page_window(self):
+        """Показываются соседи текущей страницы, первая и последняя"""
+        self.assertEqual(
+            page_window(10, 40), [1, None, 8, 9, 10, 11, 12, None, 40])
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(page_window(5, 7), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_numbered_pages_from_counter(self):
+        """Профиль листается по номерам по счётчику постов автора"""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        page = self.get_page(url, page=3)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page.window, [1, 2, 3])
+        response = self.client.get(url)
+        self.assertContains(response, '?page=3')
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+
+    def test_overestimate_leads_to_tail(self):
+        """Завышенная оценка открывает настоящую последнюю страницу"""
+        url = reverse('posts:index')
+        newest = Post.objects.order_by('-pub_date', '-id')
+        with mock.patch('posts.estimates.posts_count', return_value=1000):
+            for number in ('last', 4, 50, 101, 10 ** 20):
+                with self.subTest(page=number):
+                    cache.clear()
+                    page = self.get_page(url, page=number)
+                    self.assertEqual(page.number, 3)
+                    self.assertEqual(list(page), list(newest[20:]))
+                    self.assertFalse(page.has_next())
+                    self.assertEqual(page.window, [1, 2, 3])
+
+    def test_underestimate_keeps_next_page(self):
+        """Заниженная оценка не прячет следующую страницу"""
+        url = reverse('posts:index')
+        newest = Post.objects.order_by('-pub_date', '-id')
+        with mock.patch('posts.estimates.posts_count', return_value=5):
+            response = self.client.get(url)
+            page = response.context['page_obj']
+            self.assertTrue(page.has_next())
+            self.assertEqual(page.window, [1, 2])
+            self.assertContains(response, 'href="?page=2"')
+            for number in (2, 3, 10 ** 20):
+                with self.subTest(page=number):
+                    cache.clear()
+                    response = self.client.get(url, {'page': number})
+                    page = response.context['page_obj']
+                    self.assertEqual(page.number, 2)
+                    self.assertEqual(list(page), list(newest[10:20]))
+                    self.assertEqual(page.window, [1, 2])
+                    self.assertNotContains(response, 'href="?page=3"')
+                    self.assertContains(
+                        response, f'?cursor={page.next_cursor}')
+        page = self.get_page(url, cursor=page.next_cursor)
+        self.assertEqual(list(page), list(newest[20:]))
+
+    def test_pages_follow_rows_for_any_estimate(self):
+        """При любой оценке страница N — это строки с (N-1)*10 по N*10"""
+        url = reverse('posts:index')
+        newest = list(Post.objects.order_by('-pub_date', '-id'))
+        for estimate in (0, 5, 15, 25, 35, 1000):
+            estimated_pages = max(1, -(-estimate // settings.OBJ_ON_PAGES))
+            with mock.patch('posts.estimates.posts_count',
+                            return_value=estimate):
+                for number in range(1, 6):
+                    with self.subTest(estimate=estimate, page=number):
+                        cache.clear()
+                        page = self.get_page(url, page=number)
+                        shown = min(number, estimated_pages + 1, 3)
+                        bottom = (shown - 1) * settings.OBJ_ON_PAGES
+                        self.assertEqual(page.number, shown)
+                        self.assertEqual(
+                            list(page),
+                            newest[bottom:bottom + settings.OBJ_ON_PAGES])
+                        self.assertEqual(page.has_next(), shown < 3)
+                        self.assertLessEqual(
+                            max(filter(None, page.window)),
+                            estimated_pages + 1)
+
+    def test_counts_refreshed_in_background(self):
+        """Оценка пересчитывается в фоне, а до того берётся дешёвая"""
+        with mock.patch('posts.estimates.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.estimates._get_executor') as executor, \
+                mock.patch.object(estimates.connection, 'close'):
+            executor.return_value.submit.side_effect = (
+                lambda func, *args: func(*args))
+            self.assertEqual(
+                estimates.posts_count(), Post.objects.order_by(
+                    '-pk').values_list('pk', flat=True).first())
+            Post.objects.filter(pk__lte=self.oldest.pk + 4).delete()
+            self.assertEqual(estimates.posts_count(), 25)
+        self.assertEqual(estimates.posts_count(), 25)
+
+    def test_one_refresh_at_a_time(self):
+        """Пока пересчёт области ждёт выполнения, второй не заводится"""
+        with mock.patch('posts.estimates.transaction.on_commit') as refresh:
+            estimates.posts_count()
+            estimates.posts_count()
+        self.assertEqual(refresh.call_count, 1)
+
+
+class ListingCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_cached(self, cached):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual('page_obj' not in response.context, cached)
+
+    def test_listing_cached_until_change(self):
+        """Списки отдаются из кэша, пока данные не изменились"""
+        self.assert_cached(False)
+        self.assert_cached(True)
+
+    def test_new_post_invalidates_listings(self):
+        """Новый пост сбрасывает кэш всех своих списков"""
+        self.assert_cached(False)
+        Post.objects.create(text='Новый', author=self.user, group=self.group)
+        self.assert_cached(False)
+
+    def test_group_change_invalidates_listings(self):
+        """Изменение группы сбрасывает кэш списков"""
+        self.assert_cached(False)
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assert_cached(False)
+
+    def test_shared_page_has_personal_header(self):
+        """Общая страница из кэша получает шапку своего пользователя"""
+        self.client.get(self.urls[0])
+        self.client.force_login(self.user)
+        response = self.client.get(self.urls[0])
+        self.assertNotIn('page_obj', response.context)
+        self.assertContains(response, 'Пользователь: auth')
+
+    def test_post_detail_personal_parts(self):
+        """Ссылка на правку и форма с CSRF-токеном не попадают в кэш"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertNotContains(response, edit_url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertNotIn('comments', response.context)
+        self.assertContains(response, edit_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.user, group=cls.group)
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_rendered_once(self):
+        """Карточка поста рендерится один раз для всех лент"""
+        self.client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(
+            'includes/post_desk.html',
+            [template.name for template in response.templates])
+
+    def test_card_invalidated_on_edit(self):
+        """Правка поста обновляет его карточку"""
+        self.client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Исправленный пост', 'group': self.group.pk})
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный пост')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified(self):
+        """Повторный запрос с прежним ETag получает 304 без рендеринга"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertLessEqual(len(queries), 1)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """Страница не изменилась с даты Last-Modified"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                last_modified = self.client.get(url)['Last-Modified']
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Комментарий меняет ETag поста, профиля и группы"""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        self.post.comments.create(author=self.reader, text='Комментарий')
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_stale_page_keeps_old_validators(self):
+        """Прежняя страница, отданная во время перестройки, не получает
+        новый ETag"""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Новый пост', author=self.user)
+        with mock.patch('posts.caching._acquire', return_value=None):
+            response = self.client.get(url)
+        self.assertNotContains(response, 'Новый пост')
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый пост')
+
+    def test_etag_depends_on_visitor(self):
+        """Другой посетитель не получает чужую страницу по ETag"""
+        client = Client()
+        client.force_login(self.reader)
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(COMMENTS_ON_PAGE=5)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        cls.quiet_post = Post.objects.create(text='Тихий', author=cls.user)
+        for number in range(12):
+            cls.post.comments.create(
+                author=User.objects.create_user(username=f'reader{number}'),
+                text=f'Комментарий {number}')
+        cls.quiet_post.comments.create(author=cls.user, text='Единственный')
+
+    def setUp(self):
+        cache.clear()
+
+    def detail_url(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def test_queries_do_not_grow_with_comments(self):
+        """Число запросов страницы поста не зависит от комментариев"""
+        counts = []
+        for post in (self.quiet_post, self.post):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.detail_url(post))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(response.context['post'].author_posts_count, 2)
+
+    def test_comments_paginated_by_cursor(self):
+        """Комментарии приходят страницами, «показать ещё» ведёт дальше"""
+        response = self.client.get(self.detail_url(self.post))
+        page = response.context['comments']
+        self.assertEqual(len(page), 5)
+        self.assertContains(response, 'Комментарий 11')
+        self.assertNotContains(response, 'Комментарий 6')
+        seen = [comment.pk for comment in page]
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        while page.has_next():
+            response = self.client.get(url, {'cursor': page.next_cursor})
+            self.assertTemplateUsed(response, 'includes/comments.html')
+            self.assertNotContains(response, '<html')
+            page = response.context['comments']
+            seen.extend(comment.pk for comment in page)
+        self.assertEqual(
+            seen, list(self.post.comments.order_by(
+                '-created', '-id').values_list('pk', flat=True)))
+
+    def test_comments_fragment_of_missing_post(self):
+        """Фрагмент комментариев несуществующего поста отдаёт 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
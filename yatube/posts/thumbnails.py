@@ -0,0 +1,197 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .caching import exclusive
+from .models import Post
+from .signals import bump_post_listings
+
+THUMBNAILS_LOCK = 'thumbnails:{}'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Кладёт миниатюры рядом с исходной картинкой.
+
+    posts/cat.gif → posts/cat_320x113_1a2b3c4d.webp; хвост из хэша
+    отличает варианты одного размера с разными параметрами.
+    """
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        stem = os.path.splitext(source.name)[0]
+        extension = EXTENSIONS[options['format']]
+        return f'{stem}_{geometry_string}_{key[:8]}.{extension}'
+
+
+def variants():
+    """Варианты картинки поста, которые умеет строить этот Pillow.
+
+    Возвращает (имя, ширина, WebP ли это) по возрастанию ширины.
+    """
+    ladder = []
+    for name, (geometry, options) in settings.POST_THUMBNAILS.items():
+        webp = options.get('format') == 'WEBP'
+        if webp and not features.check('webp'):
+            continue
+        ladder.append((name, int(geometry.split('x')[0]), webp))
+    return sorted(ladder, key=lambda variant: variant[1])
+
+
+def _options(source, options):
+    """Дополняет параметры так же, как sorl перед вычислением имени."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, variant):
+    """Файл миниатюры `variant`: имя считается по пути, без декодирования."""
+    geometry, options = settings.POST_THUMBNAILS[variant]
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def lookup(image, variant):
+    """Готовая миниатюра из хранилища sorl или None, если её ещё нет."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, variant))
+
+
+def lookup_many(images, names):
+    """Готовые миниатюры набора картинок: {(имя файла, вариант): файл}.
+
+    Для хранилища sorl в кэше и базе делает один `get_many` и не больше
+    одного запроса к базе на все картинки и варианты вместо обхода
+    по одной.
+    """
+    files = {
+        (image.name, name): thumbnail_file(image, name)
+        for image in images if image for name in names}
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {pair: kvstore.get(file) for pair, file in files.items()}
+    keys = {pair: add_prefix(file.key) for pair, file in files.items()}
+    values = kvstore.cache.get_many(list(keys.values()))
+    missing = [key for key in keys.values() if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        pair: None if values[key] == EMPTY_VALUE
+        else deserialize_image_file(values[key])
+        for pair, key in keys.items()}
+
+
+def prefetch(posts):
+    """Заранее находит все варианты картинок для страницы постов."""
+    posts = [post for post in posts if post.image]
+    names = [name for name, _, _ in variants()]
+    found = lookup_many([post.image for post in posts], names)
+    for post in posts:
+        post.prefetched_thumbnails = {
+            name: found[post.image.name, name] for name in names}
+
+
+def get(post, variant):
+    """Миниатюра поста: из предвыборки страницы или отдельным поиском."""
+    prefetched = getattr(post, 'prefetched_thumbnails', {})
+    if variant in prefetched:
+        return prefetched[variant]
+    return lookup(post.image, variant)
+
+
+def ready(post):
+    """Построены ли все варианты картинки поста."""
+    return all(
+        get(post, name) is not None for name, _, _ in variants())
+
+
+def generate(post_id):
+    """Строит все миниатюры поста и сбрасывает страницы с ним.
+
+    Посты с одинаковой картинкой делят один файл и его миниатюры, поэтому
+    построение идёт под замком на имя файла: иначе два задания разом
+    сохраняли бы одну миниатюру, и хранилище добавило бы ко второй копии
+    случайный хвост, оставив файл, о котором sorl не знает.
+    """
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    with exclusive(THUMBNAILS_LOCK.format(post.image.name)):
+        if not ready(post):
+            for name, _, _ in variants():
+                geometry, options = settings.POST_THUMBNAILS[name]
+                get_thumbnail(post.image, geometry, **options)
+    bump_post_listings(post, (post.group_id,))
+
+
+def _build(post_id):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+
+
+def _run(post_id):
+    try:
+        _build(post_id)
+    finally:
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def enqueue(post):
+    """Ставит построение миниатюр в очередь после коммита транзакции.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры строятся сразу после коммита
+    в том же потоке.
+    """
+    if not post.image:
+        return
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run, post.pk))
+    else:
+        transaction.on_commit(lambda: _build(post.pk))
@@ -33,10 +33,18 @@ urlpatterns = [
         'posts/<int:post_id>/',
         views.post_detail,
         name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'),
     path(
         'posts/<int:post_id>/edit/',
         views.post_edit,
         name='post_edit'),
+    path(
+        'search/',
+        views.search,
+        name='search'),
     path(
         'create/',
         views.post_create,
@@ -1,34 +1,51 @@
-from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from django.views.decorators.cache import cache_page
+from django.db.models import F
 
+from . import (
+    caching, counters, estimates, feed, suggestions, thumbnails)
 from .forms import PostForm, CommentForm
-from .models import Post, Group, Follow, User
-
-
-def page_inator(posts, request):
-    paginator = Paginator(posts, settings.OBJ_ON_PAGES)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+from .models import Comment, Post, Group, Follow, User
+from .paginators import (
+    CursorPaginator, EstimatedCountPaginator, FeedPaginator, SearchPaginator)
+
+
+def page_inator(posts, request, paginator_class=CursorPaginator,
+                count=None, **kwargs):
+    """Страница постов по курсору или, если курсора нет и передана
+    функция оценки `count`, по номеру из ?page=."""
+    cursor = request.GET.get('cursor')
+    estimate = count() if count is not None and not cursor else None
+    if estimate is not None:
+        paginator = EstimatedCountPaginator(
+            posts, settings.OBJ_ON_PAGES, estimate)
+        page_obj = paginator.get_numbered_page(request.GET.get('page', 1))
+    else:
+        paginator = paginator_class(posts, settings.OBJ_ON_PAGES, **kwargs)
+        page_obj = paginator.get_page(cursor)
+    thumbnails.prefetch(page_obj.object_list)
     return page_obj
 
 
-@cache_page(60 * 15)
+@caching.cache_shared_page(lambda: (caching.INDEX,))
 def index(request):
     post_list = Post.objects.select_related("author", "group")
-    page_obj = page_inator(post_list, request)
+    page_obj = page_inator(
+        post_list, request, count=estimates.posts_count)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@caching.cache_shared_page(lambda slug: (caching.group_scope(slug),))
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = page_inator(posts, request)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = page_inator(
+        posts, request,
+        count=lambda: estimates.group_posts_count(group))
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -36,26 +53,62 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@caching.cache_shared_page(
+    lambda username: (caching.profile_scope(username),))
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = page_inator(posts, request)
-    following_list = Follow.objects.filter(
-        user=request.user.id, author=author.id).exists()
-
-    following = request.user.is_authenticated and following_list
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    if getattr(author, 'profile', None) is None:
+        # Профиля нет у пользователей, созданных в обход сигналов.
+        author.profile = counters.recount_profile(author.pk)
+    posts = author.posts.select_related('author', 'group')
+    page_obj = page_inator(
+        posts, request, count=lambda: author.profile.posts_count)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@caching.cache_shared_page(lambda: (caching.INDEX,))
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = SearchPaginator(query, settings.OBJ_ON_PAGES)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        thumbnails.prefetch(page_obj.object_list)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_detail_scopes(post_id):
+    username = Post.objects.filter(
+        pk=post_id).values_list('author__username', flat=True).first()
+    if username is None:
+        return None
+    return caching.post_scope(post_id), caching.profile_scope(username)
+
+
+def comments_page(post_id, request):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post=post_id).select_related('author'),
+        settings.COMMENTS_ON_PAGE, date_field='created')
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@caching.cache_shared_page(post_detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group').annotate(
+            author_posts_count=F('author__profile__posts_count')),
+        pk=post_id)
     form = CommentForm()
-    comments = post.comments.all
+    comments = comments_page(post.pk, request)
 
     context = {
         'post': post,
@@ -65,6 +118,16 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@caching.cache_shared_page(lambda post_id: (caching.post_scope(post_id),))
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post.pk, request),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -72,6 +135,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        thumbnails.enqueue(post)
         return redirect('posts:profile', request.user.username)
 
     return render(request, 'posts/create_post.html', {'form': form})
@@ -89,6 +153,8 @@ def post_edit(request, post_id):
             instance=post)
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.enqueue(post)
             return redirect('posts:post_detail', post.pk)
 
         context = {
@@ -115,13 +181,12 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    followers = request.user.follower.values('author')
-    post_list = Post.objects.select_related(
-        "author", "group").filter(
-            author__in=followers, author__following__user=request.user)
-    page_obj = page_inator(post_list, request)
+    page_obj = page_inator(
+        request.user.feed_items.all(), request, FeedPaginator,
+        pulled_authors=feed.pulled_authors(request.user.id))
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
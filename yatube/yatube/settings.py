@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -79,6 +81,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -133,6 +137,12 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 QONTIT = 10
 OBJ_ON_PAGES = 10
+# Как часто в фоне пересчитываются оценки числа постов для номеров
+# страниц.
+ESTIMATED_COUNT_TTL = 60 * 10
+COMMENTS_ON_PAGE = 20
+FEED_BATCH_SIZE = 1000
+FEED_PUSH_THRESHOLD = 5000
 
 LOGIN_URL = 'users:login'
 LOGOUT_URL = 'users:logout'
@@ -147,8 +157,73 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий кэш лежит вне исходников; тесты подменяют его своим каталогом
+# (см. core.test_runner).
+CACHE_ROOT = os.path.join(tempfile.gettempdir(), 'yatube-cache')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_MAX_BYTES': 16 * 1024 * 1024,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_ROOT,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+LISTING_CACHE_TIMEOUT = 60 * 60 * 6
+# Прежние версии страниц живут только в общем кэше: локальному уровню
+# они не нужны. Замки перестройки — файлы рядом с общим кэшем.
+STAMPEDE_CACHE = 'shared'
+STAMPEDE_LOCK_DIR = os.path.join(CACHE_ROOT, 'locks')
+STAMPEDE_WAIT = 5
+STAMPEDE_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+API_POST_CACHE_TIMEOUT = 60 * 60 * 24
+API_BATCH_LIMIT = 300
+# Сколько пользователей держит индекс подписок в памяти процесса.
+FOLLOW_GRAPH_MAX_USERS = 10000
+# Сколько рекомендаций «на кого подписаться» хранится на пользователя.
+SUGGESTIONS_PER_USER = 10
+
+# Миниатюры строятся в фоне при загрузке картинки, шаблоны только
+# читают готовые адреса. Картинка поста обрезается под POST_IMAGE_SIZE
+# и строится лесенкой ширин в WebP и в формате исходного файла.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_THUMBNAILS = {
+    f'{name}-{width}': (
+        f'{width}x{width * POST_IMAGE_SIZE[1] // POST_IMAGE_SIZE[0]}',
+        {'crop': 'center', 'upscale': True, **options})
+    for width in POST_IMAGE_WIDTHS
+    for name, options in (('webp', {'format': 'WEBP'}), ('original', {}))
 }
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+# Загрузки хранятся по хэшу содержимого, миниатюры — по своим именам.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+THUMBNAIL_PRESERVE_FORMAT = True
+# 0 — строить миниатюры сразу после коммита, без пула потоков.
+THUMBNAIL_WORKERS = 2
+
+# Загрузки всегда пишутся во временный файл кусками; картинка
+# проверяется по заголовку и пересохраняется без EXIF в отдельном
+# процессе с ограничением памяти.
+FILE_UPLOAD_HANDLERS = (
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+)
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+POST_IMAGE_WORKERS = 2
+POST_IMAGE_WORKER_MEMORY = 512 * 1024 * 1024
+POST_IMAGE_TIMEOUT = 30